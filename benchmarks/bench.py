@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""Offline benchmarks for `oc images list` and `oc images diff`
+
+Every scenario runs the real CLI in a subprocess, with a fake `oc` first in
+PATH that serves synthetic payloads built from tests/payload_data.json.
+
+    python benchmarks/bench.py --sizes 50,200 --latency 0.05 --jitter 0.02
+"""
+
+import argparse
+import copy
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+TEMPLATE = HERE.parent / "tests" / "payload_data.json"
+REPO = "quay.io/openshift-release-dev/ocp-v4.0-art-dev"
+
+RUNNER = """
+import atexit, os, resource, sys
+
+def report_rss():
+    with open(os.environ["BENCH_RSS_FILE"], "w") as f:
+        f.write(str(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss))
+
+atexit.register(report_rss)
+from oc_images.cli import images
+images(sys.argv[1:], prog_name="oc-images")
+"""
+
+
+def digest(*parts):
+    return "sha256:" + hashlib.sha256("-".join(map(str, parts)).encode()).hexdigest()
+
+
+def write_json(path: Path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(data))
+
+
+def image_info(name: str, image_digest: str):
+    labels = {
+        "com.redhat.component": f"{name}-container",
+        "version": "v4.99.0",
+        "release": f"{image_digest[7:19]}.p0.assembly.stream.el9",
+        "io.openshift.build.commit.id": image_digest[7:47],
+        "io.openshift.build.source-location": f"https://github.com/openshift/{name}",
+    }
+    return {
+        "name": f"{REPO}@{image_digest}",
+        "digest": image_digest,
+        "listDigest": "",
+        "config": {"config": {"Labels": labels}},
+    }
+
+
+def generate(data: Path, size: int, changed: float):
+    """Write two payloads and an imagestream of `size` images
+
+    The second payload differs from the first in a fraction `changed` of its
+    images, and in two names. Returns the pointers of the three collections.
+    """
+    template = json.loads(TEMPLATE.read_text())
+    entries = template["references"]["spec"]["tags"]
+    first = f"quay.io/openshift-release-dev/ocp-release:4.99.{size}-x86_64"
+    second = f"quay.io/openshift-release-dev/ocp-release:4.99.{size + 1}-x86_64"
+    imagestream = ("ocp", f"4.99-art-assembly-4.99.{size + 1}")
+
+    def payload(pointer, version):
+        info = copy.deepcopy(template)
+        info["image"] = pointer
+        tags = []
+        for i in range(size):
+            entry = copy.deepcopy(entries[i % len(entries)])
+            name = entry["name"] if i < len(entries) else f"{entry['name']}-{i}"
+            if version and i == 0:
+                name = f"{name}-new"
+            is_changed = version and i % round(1 / changed) == 0 if changed else False
+            image_digest = digest(size, i, version if is_changed else 0)
+            entry["name"] = name
+            entry["from"]["name"] = f"{REPO}@{image_digest}"
+            tags.append(entry)
+            write_json(
+                data / "images" / f"{image_digest}.json", image_info(name, image_digest)
+            )
+        info["references"]["spec"]["tags"] = tags
+        key = hashlib.sha256(pointer.encode()).hexdigest()
+        write_json(data / "releases" / f"{key}.json", info)
+        return tags
+
+    payload(first, 0)
+    tags = payload(second, 1)
+    write_json(
+        data / "imagestreams" / imagestream[0] / f"{imagestream[1]}.json",
+        {
+            "kind": "ImageStream",
+            "metadata": {
+                "namespace": imagestream[0],
+                "name": imagestream[1],
+                "resourceVersion": str(size),
+            },
+            "status": {
+                "tags": [
+                    {
+                        "tag": entry["name"],
+                        "items": [
+                            {
+                                "generation": 1,
+                                "dockerImageReference": entry["from"]["name"],
+                            }
+                        ],
+                    }
+                    for entry in tags
+                ]
+            },
+        },
+    )
+    return first, second, "/".join(imagestream)
+
+
+def fake_path(tmp: Path):
+    bin_dir = tmp / "bin"
+    bin_dir.mkdir(exist_ok=True)
+    oc = bin_dir / "oc"
+    oc.write_text(f'#!/bin/sh\nexec "{sys.executable}" "{HERE / "fake_oc.py"}" "$@"\n')
+    oc.chmod(0o755)
+    return f"{bin_dir}{os.pathsep}{os.environ['PATH']}"
+
+
+def measure(args: list, env: dict, tmp: Path):
+    log = Path(env["FAKE_OC_LOG"])
+    log.write_text("")
+    rss_file = tmp / "rss"
+    env = {**env, "BENCH_RSS_FILE": str(rss_file)}
+
+    with open(tmp / "stderr", "w+") as stderr:
+        start = time.perf_counter()
+        proc = subprocess.Popen(
+            [sys.executable, "-c", RUNNER, *args],
+            stdout=subprocess.PIPE,
+            stderr=stderr,
+            env=env,
+        )
+        first_output = None
+        lines = 0
+        for _ in proc.stdout:
+            if first_output is None:
+                first_output = time.perf_counter() - start
+            lines += 1
+        proc.wait()
+        wall = time.perf_counter() - start
+        stderr.seek(0)
+        error = stderr.read().strip().splitlines()[-1:] if proc.returncode else []
+
+    calls = log.read_text().splitlines()
+    return {
+        "wall_s": round(wall, 3),
+        "first_output_s": round(first_output, 3) if first_output else None,
+        "oc_calls": len(calls),
+        "oc_calls_by_kind": {
+            kind: sum(1 for c in calls if c.startswith(f"{kind} "))
+            for kind in ("RELEASE", "IMAGESTREAM", "IMAGE")
+        },
+        "peak_rss_mb": round(int(rss_file.read_text()) / 1024, 1),
+        "output_lines": lines,
+        "exit_code": proc.returncode,
+        "error": error[0] if error else "",
+    }
+
+
+def scenarios(first: str, second: str, imagestream: str):
+    cold = ["--no-cache"]
+    return [
+        ("startup (--help)", ["--help"]),
+        ("list", cold + ["list", first]),
+        ("list --stream", cold + ["list", "--stream", "--order", "completion", first]),
+        ("list (warm cache)", ["list", first]),
+        ("diff payloads", cold + ["diff", first, second]),
+        ("diff payload imagestream", cold + ["diff", first, imagestream]),
+    ]
+
+
+def run(options):
+    results = []
+    for size in options.sizes:
+        with tempfile.TemporaryDirectory(prefix="oc-images-bench-") as tmp:
+            tmp = Path(tmp)
+            pointers = generate(tmp / "data", size, options.changed)
+            env = {
+                **os.environ,
+                "PATH": fake_path(tmp),
+                "XDG_CACHE_HOME": str(tmp / "cache"),
+                "FAKE_OC_DATA": str(tmp / "data"),
+                "FAKE_OC_LOG": str(tmp / "oc.log"),
+                "FAKE_OC_LATENCY": str(options.latency),
+                "FAKE_OC_JITTER": str(options.jitter),
+                "FAKE_OC_FAILURE_RATE": str(options.failure_rate),
+            }
+            for name, args in scenarios(*pointers):
+                if "warm" in name:
+                    # Fill the caches first
+                    measure(options.extra_args + args, env, tmp)
+                result = measure(options.extra_args + args, env, tmp)
+                results.append({"size": size, "scenario": name, **result})
+                if not options.json:
+                    report(results[-1])
+    return results
+
+
+def report(result):
+    first_output = result["first_output_s"]
+    print(
+        f"{result['size']:>5} {result['scenario']:<26}"
+        f" wall {result['wall_s']:7.3f}s"
+        f" first output {first_output if first_output is not None else '-':>6}s"
+        f" oc calls {result['oc_calls']:>5}"
+        f" peak rss {result['peak_rss_mb']:6.1f}MB"
+        + (
+            f" exit {result['exit_code']}: {result['error']}"
+            if result["exit_code"]
+            else ""
+        ),
+        flush=True,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--sizes",
+        default="50,200,500,1000,2000",
+        type=lambda s: [int(n) for n in s.split(",")],
+        help="comma separated numbers of images per payload",
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.05, help="seconds per oc call"
+    )
+    parser.add_argument(
+        "--jitter", type=float, default=0.02, help="random extra seconds"
+    )
+    parser.add_argument(
+        "--failure-rate", type=float, default=0.0, help="fraction of failing calls"
+    )
+    parser.add_argument(
+        "--changed", type=float, default=0.1, help="fraction of images that differ"
+    )
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    parser.add_argument(
+        "extra_args",
+        nargs="*",
+        help="global oc-images options for every scenario, after --",
+    )
+    options = parser.parse_args()
+    results = run(options)
+    if options.json:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
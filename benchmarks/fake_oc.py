@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""Stand-in for `oc` that serves recorded JSON with simulated latency
+
+Fixtures are read from $FAKE_OC_DATA:
+  releases/<sha256 of pullspec>.json   output of `oc adm release info -o json`
+  imagestreams/<namespace>/<name>.json output of `oc get is -o json`
+  images/<digest>.json                 output of `oc image info -o json`
+
+Behaviour is tuned with environment variables:
+  FAKE_OC_LATENCY          seconds every call takes, default 0
+  FAKE_OC_LATENCY_<KIND>   override for RELEASE, IMAGESTREAM or IMAGE calls
+  FAKE_OC_JITTER           up to this many extra seconds, at random
+  FAKE_OC_FAILURE_RATE     fraction of calls that fail like a flaky registry
+  FAKE_OC_LOG              file to append every invocation to
+"""
+
+import hashlib
+import json
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+
+def parse(argv):
+    namespace, output, positional = "", "", []
+    args = iter(argv)
+    for arg in args:
+        if arg in ("--namespace", "-n"):
+            namespace = next(args)
+        elif arg in ("--output", "-o"):
+            output = next(args)
+        elif arg.startswith("--output="):
+            output = arg.split("=", 1)[1]
+        else:
+            positional.append(arg)
+    return namespace, output, positional
+
+
+def respond(data: Path, namespace: str, output: str, positional: list):
+    """Return kind, exit code and stdout for a command line"""
+    match positional:
+        case ["adm", "release", "info", pullspec]:
+            key = hashlib.sha256(pullspec.encode()).hexdigest()
+            path = data / "releases" / f"{key}.json"
+            kind = "RELEASE"
+        case ["image", "info", pullspec]:
+            digest = pullspec.partition("@")[2] or pullspec.replace("/", "_")
+            path = data / "images" / f"{digest}.json"
+            kind = "IMAGE"
+        case ["get", "is", name]:
+            path = data / "imagestreams" / namespace / f"{name}.json"
+            kind = "IMAGESTREAM"
+        case ["get", "is"]:
+            items = [
+                json.loads(p.read_text())
+                for p in sorted((data / "imagestreams" / namespace).glob("*.json"))
+            ]
+            return "IMAGESTREAM", 0, json.dumps({"kind": "List", "items": items})
+        case _:
+            return "UNKNOWN", 1, ""
+
+    if not path.exists():
+        return kind, 1, ""
+    if output == "jsonpath={.metadata}":
+        return kind, 0, json.dumps(json.loads(path.read_text())["metadata"])
+    return kind, 0, path.read_text()
+
+
+def main(argv):
+    data = Path(os.environ.get("FAKE_OC_DATA", "."))
+    namespace, output, positional = parse(argv)
+    kind, code, stdout = respond(data, namespace, output, positional)
+
+    if log := os.environ.get("FAKE_OC_LOG"):
+        with open(log, "a") as f:
+            f.write(f"{kind} {' '.join(argv)}\n")
+
+    latency = float(
+        os.environ.get(
+            f"FAKE_OC_LATENCY_{kind}", os.environ.get("FAKE_OC_LATENCY", "0")
+        )
+    )
+    latency += random.uniform(0, float(os.environ.get("FAKE_OC_JITTER", "0")))
+    time.sleep(latency)
+
+    if random.random() < float(os.environ.get("FAKE_OC_FAILURE_RATE", "0")):
+        print(
+            "error: received unexpected HTTP status: 503 Service Unavailable",
+            file=sys.stderr,
+        )
+        return 1
+    if code:
+        print(f"error: unable to serve {' '.join(argv)}", file=sys.stderr)
+        return code
+    sys.stdout.write(stdout)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
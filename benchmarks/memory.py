@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""Memory that loaded collections hold on to, measured with tracemalloc
+
+Loads a series of synthetic payloads, like consecutive nightlies that differ
+in a fraction of their images, through a fake `oc`, and reports what stays
+allocated once they are loaded and, with --inspect, resolved.
+
+    python benchmarks/memory.py --size 2000 --collections 10 --inspect
+"""
+
+import argparse
+import asyncio
+import copy
+import gc
+import hashlib
+import json
+import os
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+from bench import REPO, TEMPLATE, digest, fake_path, image_info, write_json
+
+
+def generate(data: Path, size: int, collections: int, changed: float):
+    """Write `collections` payloads of `size` images, and the info of every image
+
+    Each payload differs from the one before it in a fraction `changed` of
+    its images. Returns the pointers of the payloads.
+    """
+    template = json.loads(TEMPLATE.read_text())
+    entries = template["references"]["spec"]["tags"]
+    builds = [0] * size
+    pointers = []
+    for n in range(collections):
+        pointer = f"quay.io/openshift-release-dev/ocp-release:4.99.{n}-x86_64"
+        info = copy.deepcopy(template)
+        info["image"] = pointer
+        info["digest"] = digest("payload", n)
+        tags = []
+        for i in range(size):
+            if n and i % round(1 / changed) == n % round(1 / changed):
+                builds[i] = n
+            entry = copy.deepcopy(entries[i % len(entries)])
+            name = entry["name"] if i < len(entries) else f"{entry['name']}-{i}"
+            image_digest = digest(size, i, builds[i])
+            entry["name"] = name
+            entry["from"]["name"] = f"{REPO}@{image_digest}"
+            tags.append(entry)
+            path = data / "images" / f"{image_digest}.json"
+            if not path.exists():
+                write_json(path, image_info(name, image_digest))
+        info["references"]["spec"]["tags"] = tags
+        key = hashlib.sha256(pointer.encode()).hexdigest()
+        write_json(data / "releases" / f"{key}.json", info)
+        pointers.append(pointer)
+    return pointers
+
+
+async def load(pointers, inspect: bool):
+    from oc_images.imagecollection import ImageCollection
+
+    collections = [ImageCollection(pointer) for pointer in pointers]
+    for collection in collections:
+        if inspect:
+            await collection.resolve()
+        else:
+            await collection.images()
+    return collections
+
+
+def measure(data: Path, pointers: list, inspect: bool):
+    from oc_images.cache import image_cache, metadata_cache
+    from oc_images.image import parse_info
+
+    metadata_cache.enabled = False
+    if inspect:
+        # Inspections come from the image cache, which is not counted
+        for path in (data / "images").glob("*.json"):
+            image_cache.put(path.stem, parse_info(json.loads(path.read_text())))
+
+    gc.collect()
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    collections = asyncio.run(load(pointers, inspect))
+    gc.collect()
+    after, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    images = sum(len(c._images) for c in collections)
+    return {
+        "collections": len(collections),
+        "images": images,
+        "retained_mb": round((after - before) / 2**20, 2),
+        "peak_mb": round((peak - before) / 2**20, 2),
+        "bytes_per_image": round((after - before) / images),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=2000, help="images per payload")
+    parser.add_argument(
+        "--collections", type=int, default=10, help="number of payloads"
+    )
+    parser.add_argument(
+        "--changed", type=float, default=0.1, help="fraction of images that differ"
+    )
+    parser.add_argument(
+        "--inspect", action="store_true", help="also resolve all image fields"
+    )
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    options = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="oc-images-memory-") as tmp:
+        tmp = Path(tmp)
+        pointers = generate(
+            tmp / "data", options.size, options.collections, options.changed
+        )
+        os.environ.update(
+            {
+                "PATH": fake_path(tmp),
+                "XDG_CACHE_HOME": str(tmp / "cache"),
+                "FAKE_OC_DATA": str(tmp / "data"),
+            }
+        )
+        result = {
+            "size": options.size,
+            **measure(tmp / "data", pointers, options.inspect),
+        }
+
+    if options.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print(
+            f"{result['collections']} collections of {result['size']} images:"
+            f" {result['retained_mb']}MB retained, {result['peak_mb']}MB peak,"
+            f" {result['bytes_per_image']} bytes per image"
+        )
+
+
+if __name__ == "__main__":
+    main()
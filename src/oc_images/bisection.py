@@ -0,0 +1,48 @@
+from oc_images.imagecollection import ImageCollection
+from oc_images.util import gather
+
+
+class Bisector:
+    """Find the first of an ordered list of collections where an image changed
+
+    Collections go from good, where the image is as it used to be, to bad,
+    where it changed. Only the collections that get probed are loaded, and
+    images are compared by digest, so no image needs to be inspected.
+    """
+
+    def __init__(self, name: str, pointers):
+        if len(pointers) < 2:
+            raise ValueError("Specify at least a good and a bad collection")
+        self.name = name
+        self.collections = [ImageCollection(p) for p in pointers]
+
+        # (collection, whether the image is as in the good one) per probe
+        self.steps: list = []
+
+    async def image(self, index: int):
+        images = await self.collections[index].images()
+        return images.get(self.name)
+
+    @staticmethod
+    def identity(image):
+        return (image.digest or image.pullspec) if image else None
+
+    async def bisect(self):
+        """Return the images in the last good and the first bad collection"""
+        good, bad = 0, len(self.collections) - 1
+        good_image, bad_image = await gather(self.image(good), self.image(bad))
+        if good_image is None:
+            raise ValueError(f"{self.name} is not in {self.collections[good].pointer}")
+        if self.identity(good_image) == self.identity(bad_image):
+            raise ValueError(f"{self.name} is the same in the good and bad collection")
+
+        while bad - good > 1:
+            middle = (good + bad) // 2
+            image = await self.image(middle)
+            same = self.identity(image) == self.identity(good_image)
+            self.steps.append((self.collections[middle], same))
+            if same:
+                good, good_image = middle, image
+            else:
+                bad, bad_image = middle, image
+        return (self.collections[good], good_image), (self.collections[bad], bad_image)
@@ -0,0 +1,273 @@
+import contextlib
+import gzip
+import hashlib
+import json
+import os
+from pathlib import Path
+
+CACHE_VERSION = 2
+
+
+def cache_dir() -> Path:
+    base = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(base) / "oc-images"
+
+
+class ImageCache:
+    """Persistent store of parsed image labels, keyed by manifest digest.
+
+    A `@sha256:` pullspec never changes content, so whatever `oc image info`
+    told us about a digest once stays true. Entries are kept in LRU order
+    and the least recently used ones are dropped once `max_entries` is hit.
+
+    The entries live in one JSON file, which is only rewritten when entries
+    were added. Hits reorder the entries in memory, and that order is saved
+    along with the next addition, so a run that finds everything in the
+    cache does not rewrite it. Hit and miss counters go to a small file of
+    their own.
+    """
+
+    def __init__(self, path=None, max_entries: int = 20000):
+        self.path = Path(path) if path else cache_dir() / "images.json"
+        self.stats_path = self.path.with_suffix(".stats.json")
+        self.max_entries = max_entries
+        self.enabled = True
+
+        self.hits = 0
+        self.misses = 0
+        self._entries: dict = None
+        self._dirty = False
+
+    @property
+    def entries(self):
+        if self._entries is None:
+            self._entries = self._load()
+        return self._entries
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if data.get("version") != CACHE_VERSION:
+            return {}
+        return data.get("images", {})
+
+    def _load_counters(self) -> dict:
+        try:
+            with open(self.stats_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def get(self, digest: str):
+        if not self.enabled or not digest:
+            return None
+        info = self.entries.pop(digest, None)
+        if info is None:
+            self.misses += 1
+            return None
+        # Re-insert to mark as most recently used
+        self.entries[digest] = info
+        self.hits += 1
+        return info
+
+    def put(self, digest: str, info: dict):
+        if not self.enabled or not digest:
+            return
+        self.entries.pop(digest, None)
+        self.entries[digest] = info
+        self._dirty = True
+
+    def evict(self):
+        excess = len(self.entries) - self.max_entries
+        for digest in list(self.entries)[: max(excess, 0)]:
+            del self.entries[digest]
+
+    def _write(self, path, data):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp, "w") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp, path)
+
+    def save(self):
+        if not self.enabled:
+            return
+        if self.hits or self.misses:
+            counters = self._load_counters()
+            self._write(
+                self.stats_path,
+                {
+                    "hits": counters.get("hits", 0) + self.hits,
+                    "misses": counters.get("misses", 0) + self.misses,
+                },
+            )
+            self.hits = self.misses = 0
+        if not self._dirty:
+            return
+
+        # Merge with what other processes wrote since we loaded
+        on_disk = self._load()
+        for digest in self.entries:
+            on_disk.pop(digest, None)
+        on_disk.update(self.entries)
+        self._entries = on_disk
+        self.evict()
+        self._write(self.path, {"version": CACHE_VERSION, "images": self._entries})
+        self._dirty = False
+
+    def clear(self):
+        self._entries = {}
+        self.hits = self.misses = 0
+        self._dirty = False
+        for path in (self.path, self.stats_path):
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> dict:
+        entries = len(self.entries)
+        counters = self._load_counters()
+        try:
+            size = self.path.stat().st_size
+        except OSError:
+            size = 0
+        return {
+            "path": str(self.path),
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "size_bytes": size,
+            "hits": counters.get("hits", 0) + self.hits,
+            "misses": counters.get("misses", 0) + self.misses,
+        }
+
+
+class MetadataCache:
+    """Compressed on-disk store of `oc adm release info` and `oc get is` output
+
+    Every entry is a separate gzipped JSON file. Entries can carry a version,
+    like the `resourceVersion` of an imagestream, to check for freshness. A
+    long running process can keep the `memory_entries` most recently used
+    entries parsed in memory as well.
+    """
+
+    def __init__(self, path=None, max_entries: int = 200, memory_entries: int = 0):
+        self.path = Path(path) if path else cache_dir() / "metadata"
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self.enabled = True
+        self._memory: dict = {}
+        # Number of entry files, counted on the first put
+        self._files: int = None
+
+        self.hits = 0
+        self.misses = 0
+
+    def _file(self, key: str) -> Path:
+        return self.path / f"{hashlib.sha256(key.encode()).hexdigest()}.json.gz"
+
+    def _read(self, key: str):
+        if entry := self._memory.pop(key, None):
+            self._remember(entry)
+            return entry
+        try:
+            with gzip.open(self._file(key), "rt") as f:
+                entry = json.load(f)
+        except (OSError, ValueError, EOFError):
+            return None
+        if entry.get("key") != key:
+            return None
+        self._remember(entry)
+        return entry
+
+    def _remember(self, entry: dict):
+        if not self.memory_entries:
+            return
+        self._memory[entry["key"]] = entry
+        for key in list(self._memory)[
+            : max(len(self._memory) - self.memory_entries, 0)
+        ]:
+            del self._memory[key]
+
+    def version(self, key: str):
+        """Version of the cached entry, or None if there is none"""
+        if not self.enabled:
+            return None
+        entry = self._read(key)
+        return entry["version"] if entry else None
+
+    def get(self, key: str, version: str = None):
+        if not self.enabled:
+            return None
+        entry = self._read(key)
+        if not entry or entry["version"] != version:
+            self.misses += 1
+            return None
+        with contextlib.suppress(FileNotFoundError):
+            os.utime(self._file(key))
+        self.hits += 1
+        return entry["data"]
+
+    def put(self, key: str, data: dict, version: str = None):
+        if not self.enabled:
+            return
+        entry = {"key": key, "version": version, "data": data}
+        self._memory.pop(key, None)
+        self._remember(entry)
+        self.path.mkdir(parents=True, exist_ok=True)
+        path = self._file(key)
+        if self._files is None:
+            self._files = sum(1 for _ in self.path.glob("*.json.gz"))
+        if not path.exists():
+            self._files += 1
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        with gzip.open(tmp, "wt") as f:
+            json.dump(entry, f, separators=(",", ":"))
+        os.replace(tmp, path)
+        if self._files > self.max_entries:
+            self.evict()
+
+    def _stat_files(self) -> list:
+        """The entry files with their stat, skipping those removed meanwhile"""
+        files = []
+        for f in self.path.glob("*.json.gz"):
+            try:
+                files.append((f, f.stat()))
+            except FileNotFoundError:
+                # Evicted or cleared by another process
+                pass
+        return files
+
+    def evict(self):
+        """Drop the least recently used entries, down to 90% of `max_entries`
+
+        Making room for a tenth at once spares scanning the directory on
+        every put that follows.
+        """
+        files = sorted(self._stat_files(), key=lambda f: f[1].st_mtime)
+        keep = self.max_entries - self.max_entries // 10
+        for f, _ in files[: max(len(files) - keep, 0)]:
+            f.unlink(missing_ok=True)
+        self._files = min(len(files), keep)
+
+    def clear(self):
+        self._memory.clear()
+        for f in self.path.glob("*.json.gz"):
+            f.unlink(missing_ok=True)
+        self._files = 0
+
+    def stats(self) -> dict:
+        files = self._stat_files()
+        return {
+            "path": str(self.path),
+            "entries": len(files),
+            "max_entries": self.max_entries,
+            "size_bytes": sum(st.st_size for _, st in files),
+        }
+
+
+image_cache = ImageCache()
+metadata_cache = MetadataCache()
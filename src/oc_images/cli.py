@@ -1,12 +1,32 @@
 import asyncio
+import json
+import sys
 from functools import update_wrapper
 
 import click
-from rich.console import Console
-from rich.markdown import Markdown
 
-from oc_images.comparer import Comparer
-from oc_images.imagecollection import ImageCollection
+import oc_images.image
+from oc_images.bisection import Bisector
+from oc_images.cache import image_cache, metadata_cache
+from oc_images.client import socket_path
+from oc_images.comparer import Comparer, MatrixComparer, get_console
+from oc_images.image import inspections, speculations
+from oc_images.imagecollection import ARCHES, ImageCollection, namespace_index
+from oc_images.snapshot import SUFFIXES, write_snapshot
+from oc_images.trace import tracer
+from oc_images.transport import transport
+from oc_images.util import (
+    as_completed,
+    cancel,
+    cancel_outstanding,
+    default_jobs,
+    gather,
+    in_order,
+    merge,
+    policy,
+    scheduler,
+)
+from oc_images.watch import Watcher, format_event
 
 
 def click_coroutine(f):
@@ -15,30 +35,230 @@ def click_coroutine(f):
 
     def wrapper(*args, **kwargs):
         loop = asyncio.get_event_loop()
-        return loop.run_until_complete(f(*args, **kwargs))
+        try:
+            return loop.run_until_complete(f(*args, **kwargs))
+        except BaseException:
+            # Do not leave hundreds of oc processes running after a failure
+            cancel_outstanding(loop)
+            raise
+        finally:
+            report_trace()
+            transport.close()
+            image_cache.save()
+            client = oc_images.image.registry_client
+            if client is not None and not client.keep_open:
+                client.close()
 
     return update_wrapper(wrapper, f)
 
 
+def arch_pointers(pointer: str, all_arches: bool) -> dict:
+    """The pointer by architecture, or as is without --all-arches"""
+    if not all_arches:
+        return {"": pointer}
+    collection = ImageCollection(pointer)
+    try:
+        return {arch: collection.arch_pointer(arch) for arch in ARCHES}
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+
+
+def report_trace():
+    ctx = click.get_current_context()
+    options = ctx.find_root().params
+    if options.get("stats"):
+        counters = {
+            "images": (image_cache.hits, image_cache.misses),
+            "metadata": (metadata_cache.hits, metadata_cache.misses),
+        }
+        print(tracer.summary(counters), file=sys.stderr)
+        client = oc_images.image.registry_client
+        fallbacks = f", registry fallbacks: {client.fallbacks}" if client else ""
+        print(
+            f"Retries: {policy.retried}, timeouts: {policy.timeouts},"
+            f" hedged: {policy.hedged}{fallbacks}",
+            file=sys.stderr,
+        )
+    if options.get("trace"):
+        tracer.write_trace(options["trace"])
+
+
 @click.group(context_settings=dict(help_option_names=["-h", "--help"]))
-def images():
+@click.option(
+    "--no-cache",
+    is_flag=True,
+    help="Do not read or write the local image and metadata caches",
+)
+@click.option(
+    "--jobs",
+    "-j",
+    type=click.IntRange(min=1),
+    default=default_jobs,
+    show_default="2 per core, at most 32",
+    help="Maximum number of concurrent oc processes",
+)
+@click.option(
+    "--backend",
+    type=click.Choice(["oc", "registry"]),
+    default="oc",
+    show_default=True,
+    help="Inspect images with `oc image info`, or query registries directly",
+)
+@click.option(
+    "--insecure-registry",
+    metavar="HOST",
+    multiple=True,
+    help="Talk plain HTTP to this registry with --backend registry",
+)
+@click.option(
+    "--stats", is_flag=True, help="Print timing statistics of oc calls to stderr"
+)
+@click.option(
+    "--trace",
+    type=click.Path(dir_okay=False, writable=True),
+    help="Write a Chrome/Perfetto trace of all oc calls to this file",
+)
+@click.option(
+    "--timeout",
+    type=click.FloatRange(min=0),
+    default=120,
+    show_default=True,
+    help="Seconds before an oc process is killed and retried, 0 to wait forever",
+)
+@click.option(
+    "--retries",
+    type=click.IntRange(min=0),
+    default=3,
+    show_default=True,
+    help="Retries of oc calls that fail with a transient error",
+)
+@click.option(
+    "--hedge",
+    is_flag=True,
+    help="Start a duplicate of image inspections that are slower than 95% of others",
+)
+@click.option(
+    "--prefetch",
+    metavar="NAMESPACE",
+    multiple=True,
+    help="Fetch all imagestreams of NAMESPACE with a single oc call",
+)
+@click.option(
+    "--record",
+    type=click.Path(dir_okay=False, writable=True),
+    help="Save every oc call with its output and latency to this cassette file",
+)
+@click.option(
+    "--replay",
+    type=click.Path(exists=True, dir_okay=False),
+    help="Serve oc calls from this cassette file, instead of running oc",
+)
+@click.option(
+    "--replay-scale",
+    type=click.FloatRange(min=0),
+    default=1.0,
+    show_default=True,
+    help="Factor on the recorded latency of replayed calls, 0 to not wait at all",
+)
+def images(
+    no_cache: bool,
+    jobs: int,
+    backend: str,
+    insecure_registry: list,
+    stats: bool,
+    trace: str,
+    timeout: float,
+    retries: int,
+    hedge: bool,
+    prefetch: list,
+    record: str,
+    replay: str,
+    replay_scale: float,
+):
     """\
     oc images: Generate reports of imagestreams or payloads
 
     \b
     oc images list -h
     oc images diff -h
+    oc images matrix -h
+    oc images watch -h
+    oc images bisect -h
+    oc images snapshot -h
+    oc images index -h
+    oc images query -h
+    oc images cache-stats
+    oc images serve -h
     oc images help-collection
     """
+    image_cache.enabled = not no_cache
+    metadata_cache.enabled = not no_cache
+    scheduler.jobs = jobs
+    oc_images.image.registry_client = None
+    if backend == "registry":
+        from oc_images.registry import registry_client
+
+        registry_client.insecure = set(insecure_registry)
+        oc_images.image.registry_client = registry_client
+    tracer.enabled = stats or bool(trace)
+    policy.timeout = timeout
+    policy.retries = retries
+    policy.hedge = hedge
+    # `serve` runs many commands in one process, where each starts over
+    inspections.clear()
+    speculations.clear()
+    namespace_index.clear()
+    for namespace in prefetch:
+        namespace_index.add(namespace)
+    tracer.reset()
+    if record and replay:
+        raise click.UsageError("--record and --replay cannot be used together")
+    transport.reset()
+    if record:
+        transport.record(record)
+    elif replay:
+        try:
+            transport.replay(replay, replay_scale)
+        except (ValueError, KeyError) as e:
+            raise click.BadParameter(str(e), param_hint="--replay")
 
 
 @images.command("list")
 @click.option("--filter", "-f", help="filter by payload name")
 @click.option("--name", "-n", multiple=True, help="Report on exact payload names")
 @click.option("--pullspec", "-p", is_flag=True, help="Return pullspec rather than nvr")
+@click.option(
+    "--fast",
+    is_flag=True,
+    help="Report commit and source repo from payload annotations, without inspecting images",
+)
+@click.option(
+    "--stream", "-s", is_flag=True, help="Print each nvr as soon as it is known"
+)
+@click.option(
+    "--order",
+    type=click.Choice(["name", "completion"]),
+    default="name",
+    show_default=True,
+    help="Order of streamed output",
+)
+@click.option(
+    "--all-arches",
+    is_flag=True,
+    help=f"List the collection for each of {', '.join(ARCHES)}, prefixed by arch",
+)
 @click.argument("collection")
 @click_coroutine
-async def list_collection(filter: str, name: list, pullspec: str, collection: str = ""):
+async def list_collection(
+    filter: str,
+    name: list,
+    pullspec: str,
+    fast: bool,
+    stream: bool,
+    order: str,
+    all_arches: bool,
+    collection: str = "",
+):
     """\
     List contents of image stream or payload
 
@@ -54,6 +274,12 @@ async def list_collection(filter: str, name: list, pullspec: str, collection: st
         into the next nightly
       oc images list --name cli quay.io/openshift-release-dev/ocp-release:4.19.0-ec.4-x86_64
         Look for nvr of payload name 'cli' in release
+      oc images list --stream --order completion 4.19-art-latest | grep ironic
+        Print nvrs as soon as they are inspected
+      oc images list --fast quay.io/openshift-release-dev/ocp-release:4.19.0-ec.4-x86_64
+        List commit and source repo of every payload entry, without inspecting images
+      oc images list --all-arches --name ironic 4.18.3
+        Show the nvr of 'ironic' in the 4.18.3 assembly of every architecture
 
     Run 'oc images help-collection' for help on specifying payloads, imagestreams, and assemblies
     """
@@ -61,29 +287,71 @@ async def list_collection(filter: str, name: list, pullspec: str, collection: st
     if filter and name:
         raise click.BadParameter("Filter and name cannot both be specified")
 
-    ic = ImageCollection(collection)
-    images = await ic.images()
+    pointers = arch_pointers(collection, all_arches)
+    # All arches are fetched and inspected at once, under the same job limit
+    all_images = await gather(*[ImageCollection(p).images() for p in pointers.values()])
     to_report = []
-    for tag, image in images.items():
-        if filter and filter not in tag:
-            continue
-        elif name and tag not in name:
-            continue
-        to_report.append(image)
+    for arch, images in zip(pointers, all_images):
+        for tag, image in images.items():
+            if filter and filter not in tag:
+                continue
+            elif name and tag not in name:
+                continue
+            to_report.append((arch, image))
+
+    def prefixed(arch, line):
+        return f"{arch} {line}" if arch else line
 
     if pullspec:
-        print("\n".join([f"{i.name} {i.pullspec}" for i in to_report]))
+        print(
+            "\n".join(prefixed(arch, f"{i.name} {i.pullspec}") for arch, i in to_report)
+        )
         return
 
-    tasks = [asyncio.create_task(image.nvr()) for image in to_report]
-    result = await asyncio.gather(*tasks)
-    print("\n".join(result))
+    async def report(arch, image):
+        if fast:
+            # Payloads carry these as annotations, imagestreams need an inspection
+            line = f"{image.name} {await image.commit()} {await image.repo()}"
+        else:
+            line = await image.nvr()
+        return prefixed(arch, line)
+
+    if not stream:
+        tasks = [asyncio.create_task(report(*entry)) for entry in to_report]
+        result = await gather(*tasks)
+        print("\n".join(result))
+        return
+
+    if order == "name":
+        to_report.sort(key=lambda entry: entry[1].name)
+    tasks = [asyncio.create_task(report(*entry)) for entry in to_report]
+    results = in_order(tasks) if order == "name" else as_completed(tasks)
+    async for line in results:
+        print(line, flush=True)
 
 
 @images.command()
+@click.option(
+    "--fast",
+    is_flag=True,
+    help="Compare commits from payload annotations, without inspecting images",
+)
+@click.option(
+    "--output",
+    "-o",
+    type=click.Choice(["table", "ndjson", "json"]),
+    default="table",
+    show_default=True,
+    help="Render tables, or stream a JSON record per changed payload name",
+)
+@click.option(
+    "--all-arches",
+    is_flag=True,
+    help=f"Compare the collections for each of {', '.join(ARCHES)}",
+)
 @click.argument("collection", nargs=2)
 @click_coroutine
-async def diff(collection):
+async def diff(fast: bool, output: str, all_arches: bool, collection):
     """\
     Show differences between two payload/imagestreams/assemblies
 
@@ -95,16 +363,360 @@ async def diff(collection):
         oc images diff 4.19-latest registry.ci.openshift.org/ocp/release:4.19.0-0.nightly-2025-06-09-104318
       Show diff between imagestreams of custom assembly and standard assembly:
         oc images diff 4.14-art123 4.14.52
+      Stream changes as JSON, one record per line:
+        oc images diff --output ndjson 4.18.2 4.18.3 | jq -r 'select(.change == "changed") | .name'
+      Did any commit change between two nightlies?
+        oc images diff --fast registry.ci.openshift.org/ocp/release:4.20.0-0.nightly-2025-06-06-044542 registry.ci.openshift.org/ocp/release:4.20.0-0.nightly-2025-06-09-104318
+      Compare two assemblies on all architectures at once:
+        oc images diff --all-arches 4.18.2 4.18.3
 
     Run 'oc images help-collection' for help on specifying payloads, imagestreams, and assemblies
     """
-    comparer = Comparer(*collection)
+    firsts = arch_pointers(collection[0], all_arches)
+    seconds = arch_pointers(collection[1], all_arches)
+    comparers = {
+        arch: Comparer(firsts[arch], seconds[arch], fast=fast) for arch in firsts
+    }
+
+    async def records(arch, comparer):
+        async for record in comparer.records():
+            yield {"arch": arch, **record} if arch else record
+
+    if output in ("ndjson", "json"):
+        all_records = merge(*[records(*item) for item in comparers.items()])
+        if output == "ndjson":
+            async for record in all_records:
+                print(json.dumps(record), flush=True)
+            return
+        # Stream the elements of the list as they come in
+        separator = "\n"
+        print("[", end="")
+        async for record in all_records:
+            print(separator + json.dumps(record), end="", flush=True)
+            separator = ",\n"
+        print("\n]")
+        return
+
+    async def payload_diff(name_diff, comparer):
+        await name_diff
+        await comparer.gen_payload_diff()
+
+    # Report every part as soon as it is known: the names only in either
+    # collection come out while the images that changed are inspected
+    name_diffs = [asyncio.create_task(c.gen_name_diff()) for c in comparers.values()]
+    payload_diffs = [
+        asyncio.create_task(payload_diff(name_diff, comparer))
+        for name_diff, comparer in zip(name_diffs, comparers.values())
+    ]
+    try:
+        for (arch, comparer), name_diff, payload_diff_task in zip(
+            comparers.items(), name_diffs, payload_diffs
+        ):
+            await name_diff
+            if arch:
+                get_console().rule(arch)
+            comparer.report_name_diff()
+            await payload_diff_task
+            await comparer.report_nvrdiff()
+    except BaseException:
+        # Also consumes the errors of the tasks that are not awaited above
+        await cancel(name_diffs + payload_diffs)
+        raise
+
+
+@images.command()
+@click.option(
+    "--fast",
+    is_flag=True,
+    help="Compare commits from payload annotations, without inspecting images",
+)
+@click.option(
+    "--all", "show_all", is_flag=True, help="Also show entries that are the same"
+)
+@click.argument("collection", nargs=-1, required=True)
+@click_coroutine
+async def matrix(fast: bool, show_all: bool, collection):
+    """\
+    Show which NVR every payload/imagestream/assembly carries, side by side
 
-    await comparer.gen_name_diff()
-    await comparer.gen_payload_diff()
+    \b
+    Examples:
+      Compare the candidates for a release:
+        oc images matrix 4.18.3 4.18-art-assembly-rc.1 4.18-art-latest
+      Compare the architectures of an assembly:
+        oc images matrix ocp/4.18-art-latest ocp-s390x/4.18-art-latest-s390x ocp-arm64/4.18-art-latest-arm64
 
-    await comparer.report_nvrdiff()
-    comparer.report_name_diff()
+    Every distinct image is inspected once, however many collections carry it.
+    With three or more imagestreams in a namespace, all imagestreams of the
+    namespace are fetched at once.
+
+    Run 'oc images help-collection' for help on specifying payloads, imagestreams, and assemblies
+    """
+    if len(collection) < 2:
+        raise click.BadParameter("Specify at least two collections")
+
+    comparer = MatrixComparer(collection, fast=fast, show_all=show_all)
+    namespace_index.add_for(comparer.collections)
+    await comparer.gen_matrix()
+    await comparer.report_matrix()
+
+
+@images.command()
+@click.option(
+    "--interval",
+    "-i",
+    type=click.IntRange(min=1),
+    default=60,
+    show_default=True,
+    help="Seconds between polls",
+)
+@click.option("--count", "-c", type=click.IntRange(min=1), help="Stop after N polls")
+@click.argument("collection")
+@click_coroutine
+async def watch(interval: int, count: int, collection: str):
+    """\
+    Follow an imagestream and print the tags that change
+
+    Tags that were imported again without a new digest are reported as
+    reimported. Only images of tags that point to a new digest get inspected.
+
+    \b
+    Examples:
+      Will there be a new nightly?
+        oc images watch 4.20-art-latest
+      Check every 5 minutes for an hour:
+        oc images watch --interval 300 --count 12 ocp-s390x/4.19-art-latest-s390x
+
+    Run 'oc images help-collection' for help on specifying payloads, imagestreams, and assemblies
+    """
+    try:
+        watcher = Watcher(collection)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+
+    async for events in watcher.watch(interval, count):
+        if watcher.polls == 1:
+            name = await watcher.collection.name()
+            print(f"Watching {name} with {len(watcher.snapshot)} tags", flush=True)
+        for event in events:
+            print(await format_event(event), flush=True)
+        image_cache.save()
+
+
+@images.command()
+@click.option("--name", "-n", required=True, help="Payload name of the image to follow")
+@click.option(
+    "--fast",
+    is_flag=True,
+    help="Report commits from payload annotations, without inspecting images",
+)
+@click.argument("good")
+@click.argument("bad")
+@click.argument("candidates", nargs=-1)
+@click_coroutine
+async def bisect(name: str, fast: bool, good: str, bad: str, candidates):
+    """\
+    Find the first of a list of payloads in which an image changed
+
+    GOOD has the image as it used to be, and BAD has the changed image.
+    CANDIDATES are the payloads in between, from old to new. They are
+    binary-searched, so only about log2(n) payloads get loaded, and images
+    are compared by digest.
+
+    \b
+    Examples:
+      Which nightly picked up the new installer?
+        oc images bisect --name installer \\
+          registry.ci.openshift.org/ocp/release:4.20.0-0.nightly-2025-06-01-000000 \\
+          registry.ci.openshift.org/ocp/release:4.20.0-0.nightly-2025-06-09-104318 \\
+          registry.ci.openshift.org/ocp/release:4.20.0-0.nightly-2025-06-0{2,3,4,5,6,7,8}-000000
+
+    Run 'oc images help-collection' for help on specifying payloads, imagestreams, and assemblies
+    """
+    try:
+        bisector = Bisector(name, [good, *candidates, bad])
+        last_good, first_bad = await bisector.bisect()
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+
+    for collection, same in bisector.steps:
+        state = "good" if same else "bad"
+        print(f"{state}: {collection.pointer}", file=sys.stderr)
+
+    async def describe(image):
+        if image is None:
+            return "-"
+        return await image.commit() if fast else await image.nvr()
+
+    for label, (collection, image) in (
+        ("Last good", last_good),
+        ("First bad", first_bad),
+    ):
+        print(f"{label}: {await collection.name()} {await describe(image)}")
+
+
+@images.command()
+@click.option(
+    "--output",
+    "-o",
+    required=True,
+    type=click.Path(dir_okay=False, writable=True),
+    help=f"File to write to, ending in {' or '.join(SUFFIXES)}",
+)
+@click.argument("collection")
+@click_coroutine
+async def snapshot(output: str, collection: str):
+    """\
+    Save a payload/imagestream/assembly with all its image metadata
+
+    The file can be used anywhere a collection is accepted, and costs no oc calls.
+
+    \b
+    Examples:
+      oc images snapshot quay.io/openshift-release-dev/ocp-release:4.18.3-x86_64 -o 4.18.3.ndjson.gz
+      oc images diff 4.18.3.ndjson.gz 4.18-art-latest
+
+    Run 'oc images help-collection' for help on specifying payloads, imagestreams, and assemblies
+    """
+    if not output.endswith(SUFFIXES):
+        raise click.BadParameter(f"Output file must end in {' or '.join(SUFFIXES)}")
+    ic = ImageCollection(collection)
+    count = await write_snapshot(ic, output)
+    print(f"Wrote {count} images of {await ic.name()} to {output}", file=sys.stderr)
+
+
+@images.command("index")
+@click.argument("collection", nargs=-1, required=True)
+@click_coroutine
+async def index_collections(collection):
+    """\
+    Record which images payloads/imagestreams/assemblies carry, for `query`
+
+    Collections that were indexed before are only indexed again when their
+    payload digest or imagestream resourceVersion changed.
+
+    \b
+    Examples:
+      oc images index quay.io/openshift-release-dev/ocp-release:4.17.{1,2,3,4,5}-x86_64
+      oc images index 4.18-art-latest
+
+    Run 'oc images help-collection' for help on specifying payloads, imagestreams, and assemblies
+    """
+    from oc_images.index import release_index
+
+    collections = [ImageCollection(pointer) for pointer in collection]
+    added = await gather(*[release_index.add(c) for c in collections])
+    for ic, was_added in zip(collections, added):
+        state = "Indexed" if was_added else "Unchanged"
+        print(f"{state} {await ic.name()}", file=sys.stderr)
+
+
+@images.command()
+@click.option(
+    "--by",
+    # The keys of oc_images.index.COLUMNS, which imports sqlite3
+    type=click.Choice(["auto", "digest", "nvr", "commit", "repo"]),
+    default="auto",
+    show_default=True,
+    help="What to look up, auto guesses from the value",
+)
+@click.option("--collection", "-c", help="Only collections with this in their name")
+@click.argument("value")
+def query(by: str, collection: str, value: str):
+    """\
+    Look up which indexed collections carry an image
+
+    VALUE is a digest, nvr, commit or source repo. Commits may be abbreviated.
+    Only what was added with `oc images index` is searched, no oc calls are made.
+
+    \b
+    Examples:
+      Which indexed releases carry this commit?
+        oc images query 8303123
+      Which 4.17 releases have this build?
+        oc images query -c 4.17 ose-installer-container-v4.17.0-202502260503.p0.g2ab9e4f.assembly.stream.el9
+    """
+    from oc_images.index import release_index
+
+    found = False
+    for collection_name, name, nvr, commit, digest in release_index.query(
+        value, "" if by == "auto" else by, collection or ""
+    ):
+        found = True
+        print(f"{collection_name} {name} {nvr} {commit} {digest}")
+    if not found:
+        sys.exit(1)
+
+
+@images.command()
+@click.option(
+    "--clear", is_flag=True, help="Remove all cached entries and the query index"
+)
+def cache_stats(clear: bool):
+    """\
+    Show statistics of the local caches
+
+    Image labels are cached by manifest digest, so repeated runs only inspect
+    images that were never seen before. Payloads addressed by digest or release
+    tag are cached for good, imagestreams as long as their resourceVersion holds.
+    The index that query searches lives next to them.
+    """
+    from oc_images.index import release_index
+
+    for kind, cache in [("images", image_cache), ("metadata", metadata_cache)]:
+        if clear:
+            cache.clear()
+        print(f"{kind}:")
+        for key, value in cache.stats().items():
+            print(f"  {key}: {value}")
+    if clear:
+        release_index.clear()
+    print("index:")
+    for key, value in release_index.stats().items():
+        print(f"  {key}: {value}")
+
+
+@images.command()
+@click.option(
+    "--socket",
+    "path",
+    type=click.Path(dir_okay=False),
+    default=socket_path,
+    show_default="$OC_IMAGES_SOCKET, or oc-images.sock in $XDG_RUNTIME_DIR",
+    help="Unix socket to listen on",
+)
+@click.option(
+    "--memory-entries",
+    type=click.IntRange(min=0),
+    default=32,
+    show_default=True,
+    help="Payloads and imagestreams to keep parsed in memory",
+)
+def serve(path: str, memory_entries: int):
+    """\
+    Run list, diff and matrix for other oc-images invocations
+
+    While this runs, `oc-images list`, `diff` and `matrix` hand their work to
+    it over a Unix socket. Payloads, imagestreams and inspected images stay in
+    memory between requests, so repeated queries return right away. Requests
+    are handled one at a time. oc runs with the environment and login of the
+    daemon. Set OC_IMAGES_NO_DAEMON=1 to run a command by itself.
+    """
+    from oc_images.daemon import Daemon
+    from oc_images.registry import registry_client
+
+    metadata_cache.memory_entries = memory_entries
+    # Registry connections stay open between requests
+    registry_client.keep_open = True
+    print(f"Serving on {path}", file=sys.stderr)
+    try:
+        Daemon(images, path).serve()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        image_cache.save()
+        registry_client.keep_open = False
+        registry_client.close()
 
 
 @images.command()
@@ -164,6 +776,14 @@ def help_collection():
     | `art123`      | `4.12-art123`     | `ocp/4.12-art-assembly-4.12-art123` |
     | `stream`      | `4.12-stream`     | `ocp/4.12-art-latest`               |
     | `stream`      | `4.20-latest`     | `ocp/4.20-art-latest`               |
+
+    ## Specify by snapshot
+
+    Files written by `oc images snapshot` end in `.ndjson` or `.ndjson.gz`, and
+    are read instead of asking `oc`.
     """
+    from rich.console import Console
+    from rich.markdown import Markdown
+
     console = Console()
     console.print(Markdown(help_collection.__doc__))
@@ -0,0 +1,118 @@
+"""Entry point that hands commands to a running `oc images serve`
+
+This module is imported on every invocation, so it only uses what Python
+has loaded at startup anyway. Without a daemon, the command runs in-process.
+"""
+
+import json
+import os
+import socket
+import stat
+import sys
+
+# Commands that the daemon runs for us, when it is there
+DAEMON_COMMANDS = ("list", "diff", "matrix")
+
+# Options of the `images` group that take a value, to find the command name
+GROUP_OPTIONS_WITH_VALUE = (
+    "--jobs",
+    "-j",
+    "--backend",
+    "--insecure-registry",
+    "--trace",
+    "--timeout",
+    "--retries",
+    "--prefetch",
+    "--record",
+    "--replay",
+    "--replay-scale",
+)
+
+
+def socket_path() -> str:
+    if path := os.environ.get("OC_IMAGES_SOCKET"):
+        return path
+    if runtime_dir := os.environ.get("XDG_RUNTIME_DIR"):
+        return os.path.join(runtime_dir, "oc-images.sock")
+    return f"/tmp/oc-images-{os.getuid()}.sock"
+
+
+def command_of(argv) -> str:
+    args = iter(argv)
+    for arg in args:
+        if arg in GROUP_OPTIONS_WITH_VALUE:
+            next(args, None)
+        elif not arg.startswith("-"):
+            return arg
+    return ""
+
+
+def trusted(path: str) -> bool:
+    """Whether `path` is our own socket, in a directory others cannot change
+
+    Anyone can create /tmp/oc-images-<uid>.sock, and would then get to see
+    our commands and answer them.
+    """
+    try:
+        st = os.lstat(path)
+        parent = os.stat(os.path.dirname(path) or ".")
+    except OSError:
+        return False
+    if not stat.S_ISSOCK(st.st_mode) or st.st_uid != os.getuid():
+        return False
+    if parent.st_mode & stat.S_ISVTX:
+        # Like /tmp, others cannot remove or rename what is ours
+        return True
+    return parent.st_uid in (os.getuid(), 0) and not parent.st_mode & (
+        stat.S_IWGRP | stat.S_IWOTH
+    )
+
+
+def connect(path: str):
+    """A connection to the daemon, or None when it does not run"""
+    if not trusted(path):
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except OSError:
+        sock.close()
+        return None
+    return sock
+
+
+def request(sock, argv) -> int:
+    """Have the daemon run a command, and relay its output"""
+    with sock, sock.makefile("rw", encoding="utf-8") as f:
+        f.write(json.dumps({"argv": argv, "cwd": os.getcwd()}) + "\n")
+        f.flush()
+        streams = {"stdout": sys.stdout, "stderr": sys.stderr}
+        try:
+            for line in f:
+                message = json.loads(line)
+                if "exit" in message:
+                    return message["exit"]
+                stream = streams[message["stream"]]
+                stream.write(message["data"])
+                stream.flush()
+        except BrokenPipeError:
+            # Our reader, like `head`, went away. Like click does in-process,
+            # exit quietly, also when what is still buffered gets flushed.
+            devnull = os.open(os.devnull, os.O_WRONLY)
+            os.dup2(devnull, sys.stdout.fileno())
+            return 1
+    print("oc images serve went away", file=sys.stderr)
+    return 1
+
+
+def main():
+    argv = sys.argv[1:]
+    if command_of(argv) in DAEMON_COMMANDS and not os.environ.get(
+        "OC_IMAGES_NO_DAEMON"
+    ):
+        if sock := connect(socket_path()):
+            sys.exit(request(sock, argv))
+
+    from oc_images.cli import images
+
+    images.main(args=argv, prog_name="oc-images")
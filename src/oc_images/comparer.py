@@ -1,29 +1,72 @@
 import asyncio
-
-from rich import print
-from rich.console import Console
-from rich.table import Table
+from functools import cache
 
 from oc_images.imagecollection import ImageCollection
+from oc_images.trace import tracer
+from oc_images.util import as_completed, cancel, gather
+
+
+@cache
+def get_console():
+    # rich takes long to import, so only do that when rendering a report
+    from rich.console import Console
+
+    return Console(width=200)
 
 
 class Comparer:
-    def __init__(self, first, second):
+    def __init__(self, first, second, fast: bool = False):
         self.first = ImageCollection(first)
         self.second = ImageCollection(second)
-
-        self.console = Console(width=200)
+        # Compare commits, which payloads provide without inspecting images
+        self.fast = fast
 
         self.report: dict() = {}
         self.nvrdiff: list = []
         self.namediff: dict() = {}
         self.common_names: set() = {}
+        # Images inspected ahead of knowing whether they changed
+        self.speculated: list = []
 
-    async def gen_name_diff(self):
-        result = await asyncio.gather(
+    async def load(self):
+        """Fetch the images of both collections
+
+        Whichever collection arrives first gets its images inspected at low
+        priority while the other is still being fetched, so that inspecting the
+        images that changed overlaps with fetching the metadata.
+        """
+        tasks = [
             asyncio.create_task(self.first.images()),
             asyncio.create_task(self.second.images()),
-        )
+        ]
+        try:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        except BaseException:
+            await cancel(tasks)
+            raise
+        if len(done) == 1:
+            (task,) = done
+            if not task.cancelled() and task.exception() is None:
+                self.speculate(task.result().values())
+        return await gather(*tasks)
+
+    def speculate(self, images):
+        fields = ("commit",) if self.fast else ("nvr",)
+        for image in images:
+            if not image.resolved(fields):
+                image.speculate()
+                self.speculated.append(image)
+
+    def settle(self, needed):
+        """Cancel the speculative inspections of images that are not needed"""
+        keys = {image.inspection_key for image in needed}
+        for image in self.speculated:
+            if image.inspection_key not in keys:
+                image.abandon()
+        self.speculated = []
+
+    async def gen_name_diff(self):
+        result = await self.load()
         first_names = set(result[0].keys())
         second_names = set(result[1].keys())
 
@@ -40,46 +83,217 @@ class Comparer:
         second_images = await self.second.images()
 
         async def create_entry(name, first, second):
-            result = await asyncio.gather(
-                asyncio.create_task(first.nvr()),
-                asyncio.create_task(second.nvr()),
-            )
+            if self.fast:
+                result = await gather(
+                    asyncio.create_task(first.commit()),
+                    asyncio.create_task(second.commit()),
+                )
+            else:
+                result = await gather(
+                    asyncio.create_task(first.nvr()),
+                    asyncio.create_task(second.nvr()),
+                )
+                if (
+                    first.manifest_digest
+                    and first.manifest_digest == second.manifest_digest
+                ):
+                    # A manifest list and the per-arch manifest it points to
+                    return None
             return {
                 "name": name,
                 "first": result[0],
                 "second": result[1],
+                # Built again from the same commit, only the digest differs
+                "rebuilt": self.fast and result[0] == result[1],
             }
 
         tasks = []
-        for name in self.common_names:
+        needed = set()
+        for name in await self.changed_names():
+            first = first_images[name]
+            second = second_images[name]
+            needed.update((first, second))
+            tasks.append(asyncio.create_task(create_entry(name, first, second)))
+        self.settle(needed)
+        self.nvrdiff = [entry for entry in await gather(*tasks) if entry]
+
+    async def changed_names(self):
+        """Common payload names that do not point to the same image"""
+        first_images = await self.first.images()
+        second_images = await self.second.images()
+        names = []
+        for name in sorted(self.common_names):
             first = first_images[name]
             second = second_images[name]
             if first.pullspec == second.pullspec:
                 continue
-            tasks.append(asyncio.create_task(create_entry(name, first, second)))
-        self.nvrdiff = await asyncio.gather(*tasks)
+            if first.digest and first.digest == second.digest:
+                # Same content, mirrored to another registry or repository
+                continue
+            names.append(name)
+        return names
+
+    async def describe(self, image):
+        return {
+            "nvr": None if self.fast else await image.nvr(),
+            "pullspec": image.pullspec,
+            "digest": image.digest,
+            "commit": await image.commit(),
+            "repo": await image.repo(),
+        }
+
+    async def records(self):
+        """Yield a record per changed, added or removed payload name
+
+        Records come out as soon as their images are inspected.
+        """
+        await self.gen_name_diff()
+        first_images = await self.first.images()
+        second_images = await self.second.images()
+
+        async def changed(name):
+            first = first_images[name]
+            second = second_images[name]
+            result = await gather(
+                asyncio.create_task(self.describe(first)),
+                asyncio.create_task(self.describe(second)),
+            )
+            if (
+                not self.fast
+                and first.manifest_digest
+                and first.manifest_digest == second.manifest_digest
+            ):
+                return None
+            return {
+                "name": name,
+                "change": "changed",
+                "first": result[0],
+                "second": result[1],
+            }
+
+        async def only_in(name, image, side):
+            return {
+                "name": name,
+                "change": "removed" if side == "first" else "added",
+                "first": None,
+                "second": None,
+                side: await self.describe(image),
+            }
+
+        changed_names = await self.changed_names()
+        tasks = [asyncio.create_task(changed(name)) for name in changed_names]
+        needed = {first_images[name] for name in changed_names}
+        needed.update(second_images[name] for name in changed_names)
+        for name in sorted(first_images.keys() - second_images.keys()):
+            needed.add(first_images[name])
+            tasks.append(
+                asyncio.create_task(only_in(name, first_images[name], "first"))
+            )
+        for name in sorted(second_images.keys() - first_images.keys()):
+            needed.add(second_images[name])
+            tasks.append(
+                asyncio.create_task(only_in(name, second_images[name], "second"))
+            )
+        self.settle(needed)
+        async for record in as_completed(tasks):
+            if record:
+                yield record
 
     async def report_nvrdiff(self):
         if not self.nvrdiff:
-            self.console.print(":tada: SHAs are all the same :tada:")
+            get_console().print(":tada: SHAs are all the same :tada:")
             return
 
+        from rich.table import Table
+
         table = Table(show_header=True, header_style="bold magenta")
-        table.title = "\n\nEnlisting difference NVRs"
+        if self.fast:
+            table.title = "\n\nEnlisting difference commits"
+            table.add_column("Payload name")
+        else:
+            table.title = "\n\nEnlisting difference NVRs"
         table.add_column(await self.first.name())
         table.add_column(await self.second.name())
+        if self.fast:
+            table.add_column("Change")
         for entry in self.nvrdiff:
-            table.add_row(entry["first"], entry["second"])
-        self.console.print(table)
+            row = [entry["first"], entry["second"]]
+            if self.fast:
+                row.insert(0, entry["name"])
+                row.append("rebuilt" if entry["rebuilt"] else "commit")
+            table.add_row(*row)
+        with tracer.span("render", "render"):
+            get_console().print(table)
 
     def report_name_diff(self):
         for name, extra in self.namediff.items():
             if not extra:
                 continue
 
+            from rich.table import Table
+
             table = Table(show_header=True, header_style="bold magenta", min_width=50)
             table.title = f"\n\nOnly in {name}"
             table.add_column("Payload name")
             for image in extra:
                 table.add_row(image)
-            self.console.print(table)
+            with tracer.span("render", "render"):
+                get_console().print(table)
+
+
+class MatrixComparer:
+    def __init__(self, collections, fast: bool = False, show_all: bool = False):
+        self.collections = [ImageCollection(c) for c in collections]
+        self.fast = fast
+        self.show_all = show_all
+
+        self.matrix: dict = {}
+
+    async def gen_matrix(self):
+        all_images = await gather(
+            *[asyncio.create_task(c.images()) for c in self.collections]
+        )
+        names = sorted(set().union(*all_images))
+
+        async def describe(image):
+            if image is None:
+                return "-"
+            if self.fast:
+                return await image.commit()
+            return await image.nvr()
+
+        async def create_row(images):
+            # Inspections are shared by digest, so every distinct image is
+            # inspected once, however many collections carry it
+            return await gather(*[describe(image) for image in images])
+
+        tasks = {}
+        for name in names:
+            images = [collection.get(name) for collection in all_images]
+            digests = {i.digest or i.pullspec for i in images if i}
+            if len(digests) == 1 and None not in images and not self.show_all:
+                continue
+            tasks[name] = asyncio.create_task(create_row(images))
+
+        rows = await gather(*tasks.values())
+        for name, row in zip(tasks, rows):
+            if len(set(row)) == 1 and not self.show_all:
+                continue
+            self.matrix[name] = row
+
+    async def report_matrix(self):
+        if not self.matrix:
+            get_console().print(":tada: SHAs are all the same :tada:")
+            return
+
+        from rich.table import Table
+
+        table = Table(show_header=True, header_style="bold magenta")
+        table.title = "\n\nEnlisting " + ("commits" if self.fast else "NVRs")
+        table.add_column("Payload name")
+        for collection in self.collections:
+            table.add_column(await collection.name())
+        for name, row in self.matrix.items():
+            table.add_row(name, *row)
+        with tracer.span("render", "render"):
+            get_console().print(table)
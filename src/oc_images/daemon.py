@@ -0,0 +1,128 @@
+import contextlib
+import json
+import os
+import signal
+import socketserver
+import sys
+import traceback
+
+import click
+
+from oc_images.client import connect
+
+
+class Stop(BaseException):
+    """Raised on SIGTERM, past the error handling of a running command"""
+
+
+def stop(signum, frame):
+    raise Stop()
+
+
+class StreamWriter:
+    """File-like object that forwards what is written to a client"""
+
+    encoding = "utf-8"
+
+    def __init__(self, wfile, stream: str):
+        self.wfile = wfile
+        self.stream = stream
+
+    def write(self, data):
+        if isinstance(data, bytes):
+            data = data.decode(self.encoding, errors="replace")
+        if data:
+            self.wfile.write(
+                (json.dumps({"stream": self.stream, "data": data}) + "\n").encode()
+            )
+        return len(data)
+
+    def flush(self):
+        self.wfile.flush()
+
+    def isatty(self):
+        return False
+
+
+class Daemon:
+    """Run CLI commands for thin clients, on one warm process
+
+    Collections, inspected images and the caches stay in memory between
+    requests. Requests are handled one at a time, each with its own working
+    directory and output streams.
+    """
+
+    def __init__(self, command: click.Command, path: str):
+        self.command = command
+        self.path = path
+        self.requests = 0
+
+    def run(self, argv) -> int:
+        try:
+            self.command.main(argv, prog_name="oc-images", standalone_mode=False)
+        except click.ClickException as e:
+            e.show()
+            return e.exit_code
+        except click.exceptions.Exit as e:
+            return e.exit_code
+        except click.Abort:
+            print("Aborted!", file=sys.stderr)
+            return 1
+        except SystemExit as e:
+            return e.code if isinstance(e.code, int) else int(e.code is not None)
+        except Exception:
+            traceback.print_exc()
+            return 1
+        return 0
+
+    def handle(self, rfile, wfile):
+        request = json.loads(rfile.readline())
+        self.requests += 1
+        cwd = os.getcwd()
+        try:
+            os.chdir(request["cwd"])
+            with (
+                contextlib.redirect_stdout(StreamWriter(wfile, "stdout")),
+                contextlib.redirect_stderr(StreamWriter(wfile, "stderr")),
+            ):
+                code = self.run(request["argv"])
+            wfile.write((json.dumps({"exit": code}) + "\n").encode())
+        except BrokenPipeError:
+            # The client went away halfway
+            pass
+        finally:
+            os.chdir(cwd)
+
+    def serve(self):
+        if sock := connect(self.path):
+            sock.close()
+            raise click.ClickException(f"Already serving on {self.path}")
+        try:
+            # Left behind by a daemon that did not exit cleanly
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+        except PermissionError:
+            raise click.ClickException(f"{self.path} belongs to another user")
+
+        daemon = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                daemon.handle(self.rfile, self.wfile)
+
+        # Clean up the socket when stopped by a service manager
+        signal.signal(signal.SIGTERM, stop)
+        # Only we may connect, from the moment the socket exists
+        umask = os.umask(0o177)
+        try:
+            server = socketserver.UnixStreamServer(self.path, Handler)
+        finally:
+            os.umask(umask)
+        with server:
+            try:
+                server.serve_forever()
+            except Stop:
+                pass
+            finally:
+                os.unlink(self.path)
@@ -1,77 +1,235 @@
-from oc_images.util import run
+import sys
+
+from oc_images.cache import image_cache
+from oc_images.trace import tracer
+from oc_images.util import Claim, SingleFlight, current_claim, run
+
+# Inspections are shared by digest across all images and collections
+inspections = SingleFlight()
+
+# Claims of speculative inspections that nobody waited for yet, by key
+speculations: dict = {}
+
+# The RegistryClient that --backend registry inspects with, rather than oc.
+# Without it, oc_images.registry is not even imported.
+registry_client = None
+
+
+def intern(value):
+    """Share equal strings, as most images are the same across collections"""
+    return sys.intern(value) if type(value) is str else value
+
+
+def parse_labels(labels: dict) -> dict:
+    return {
+        "version": labels.get(
+            "version", labels.get("org.opencontainers.image.version")
+        ),
+        "release": labels.get("release", labels.get("coreos.build.manifest-list-tag")),
+        "commit": labels.get(
+            "io.openshift.build.commit.id",
+            labels.get("org.opencontainers.image.revision"),
+        ),
+        "component": labels.get("com.redhat.component", "rhel-coreos"),
+        "repo": labels.get(
+            "io.openshift.build.source-location",
+            labels.get("org.opencontainers.image.source"),
+        ),
+        "release_operator": "io.openshift.release.operator" in labels,
+    }
+
+
+def parse_info(info: dict) -> dict:
+    return {
+        **parse_labels(info["config"]["config"]["Labels"]),
+        # The per-arch manifest that was inspected
+        "digest": info.get("digest", ""),
+    }
+
+
+async def fetch_info(pullspec: str) -> dict:
+    if registry_client is not None:
+        from oc_images.registry import RegistryError
+
+        try:
+            with tracer.span("registry inspect", "registry", pullspec=pullspec):
+                return await registry_client.image_info(pullspec)
+        except (RegistryError, OSError, EOFError, TimeoutError, ValueError, KeyError):
+            # Including a connection closed mid-response or a stalled registry
+            registry_client.fallbacks += 1
+    cmd = ["oc", "image", "info", "-o", "json", pullspec]
+    return await run(cmd)
+
+
+# Fields an inspection fills in, each with its bit in `Image._resolved`
+FIELDS = (
+    "version",
+    "release",
+    "commit",
+    "component",
+    "repo",
+    "release_operator",
+    "nvr",
+)
+_BITS = {field: 1 << i for i, field in enumerate(FIELDS)}
+INSPECTED = (1 << len(FIELDS)) - 1
+
+
+def field_mask(fields) -> int:
+    mask = 0
+    for field in fields:
+        if field not in _BITS:
+            raise ValueError(f"Unknown image field {field}")
+        mask |= _BITS[field]
+    return mask
 
 
 class Image:
+    __slots__ = (
+        "name",
+        "pullspec",
+        "_version",
+        "_release",
+        "_commit",
+        "_component",
+        "_repo",
+        "_release_operator",
+        "_nvr",
+        "_manifest_digest",
+        "_resolved",
+    )
+
     def __init__(
         self, name: str = "", pullspec: str = "", commit: str = "", repo: str = ""
     ):
-        self.name = name
-        self.pullspec = pullspec
-        self._commit = commit
-        self._repo = repo
+        self.name = intern(name)
+        self.pullspec = intern(pullspec)
+        self._commit = intern(commit)
+        self._repo = intern(repo)
 
         self._version: str = ""
         self._nvr: str = ""
         self._component: str = ""
         self._release: str = ""
-        self._release_operator: str = ""
+        self._release_operator: bool = False
+        self._manifest_digest: str = ""
+
+        # Which fields are known, rather than guessing from empty values.
+        # Payload annotations can provide the commit and repo up front.
+        self._resolved: int = 0
+        if commit:
+            self._resolved |= _BITS["commit"]
+        if repo:
+            self._resolved |= _BITS["repo"]
 
     def __repr__(self):
-        return f"{self.__class__!s}({self.__dict__})"
+        fields = {slot: getattr(self, slot) for slot in self.__slots__}
+        return f"{self.__class__!s}({fields})"
 
     def __str__(self):
         return f"{self.name}: {self.pullspec}"
 
+    @property
+    def digest(self):
+        _, sep, digest = self.pullspec.partition("@")
+        return digest if sep and digest.startswith("sha256:") else ""
+
+    def resolved(self, fields=FIELDS) -> bool:
+        mask = field_mask(fields)
+        return self._resolved & mask == mask
+
+    def export_info(self) -> dict:
+        """The inspected fields, in the form `apply_info` takes them"""
+        return {
+            "version": self._version,
+            "release": self._release,
+            "commit": self._commit,
+            "component": self._component,
+            "repo": self._repo,
+            "release_operator": self._release_operator,
+            "digest": self._manifest_digest,
+        }
+
+    @property
+    def manifest_digest(self):
+        """Digest of the per-arch manifest, once inspected
+
+        This differs from `digest` when the pullspec points to a manifest list.
+        """
+        return self._manifest_digest
+
+    @property
+    def inspection_key(self):
+        return self.digest or self.pullspec
+
     async def obtain_info(self):
-        cmd = ["oc", "image", "info", "-o", "json", self.pullspec]
-        info = await run(cmd)
-        labels = info["config"]["config"]["Labels"]
-        self._version = labels.get(
-            "version", labels.get("org.opencontainers.image.version")
-        )
-        self._release = labels.get(
-            "release", labels.get("coreos.build.manifest-list-tag")
-        )
-        self._commit = labels.get(
-            "io.openshift.build.commit.id",
-            labels.get("org.opencontainers.image.revision"),
-        )
-        self._component = labels.get("com.redhat.component", "rhel-coreos")
-        self._repo = labels.get(
-            "io.openshift.build.source-location",
-            labels.get("org.opencontainers.image.source"),
-        )
-        self._release_operator = False
-        if "io.openshift.release.operator" in labels:
-            self._release_operator = True
-        self._nvr = f"{self._component}-{self._version}-{self._release}"
+        key = self.inspection_key
+        if claim := speculations.pop(key, None):
+            claim.promote()
+        with tracer.span("inspect", "image", name=self.name):
+            info = await inspections.do(key, self._inspect)
+        self.apply_info(info)
 
-    async def nvr(self):
-        if not self._nvr:
+    def speculate(self):
+        """Start inspecting at low priority, in case the fields are needed later"""
+        key = self.inspection_key
+        if self._resolved == INSPECTED or key in speculations:
+            return
+        claim = Claim()
+        # The inspection task runs with a copy of the context as it is now
+        token = current_claim.set(claim)
+        try:
+            task = inspections.start(key, self._inspect)
+        finally:
+            current_claim.reset(token)
+        speculations[key] = claim
+        task.add_done_callback(lambda t: speculations.pop(key, None))
+
+    def abandon(self):
+        """Cancel a speculative inspection that nobody waits for"""
+        if speculations.pop(self.inspection_key, None):
+            inspections.abandon(self.inspection_key)
+
+    async def _inspect(self):
+        info = image_cache.get(self.digest)
+        if info is None:
+            info = parse_info(await fetch_info(self.pullspec))
+            image_cache.put(self.digest, info)
+        return info
+
+    def apply_info(self, info: dict):
+        self._version = intern(info["version"])
+        self._release = intern(info["release"])
+        self._commit = intern(info["commit"])
+        self._component = intern(info["component"])
+        self._repo = intern(info["repo"])
+        self._release_operator = info["release_operator"]
+        self._manifest_digest = intern(info.get("digest", ""))
+        self._nvr = intern(f"{self._component}-{self._version}-{self._release}")
+        self._resolved = INSPECTED
+
+    async def _field(self, field: str):
+        if not self._resolved & _BITS[field]:
             await self.obtain_info()
-        return self._nvr
+        return getattr(self, f"_{field}")
+
+    async def nvr(self):
+        return await self._field("nvr")
 
     async def version(self):
-        if not self._version:
-            await self.obtain_info()
-        return self._version
+        return await self._field("version")
 
     async def release(self):
-        if not self._release:
-            await self.obtain_info()
-        return self._release
+        return await self._field("release")
 
     async def commit(self):
-        if not self._commit:
-            await self.obtain_info()
-        return self._commit
+        return await self._field("commit")
+
+    async def repo(self):
+        return await self._field("repo")
 
     async def component(self):
-        if not self._component:
-            await self.obtain_info()
-        return self._component
+        return await self._field("component")
 
     async def release_operator(self):
-        if not self._release_operator:
-            await self.obtain_info()
-        return self._release_operator
+        return await self._field("release_operator")
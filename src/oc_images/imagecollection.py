@@ -1,20 +1,91 @@
+import asyncio
 import re
+import sys
 from enum import Enum
 
-from oc_images.image import Image
-from oc_images.util import run
+from oc_images.cache import metadata_cache
+from oc_images.image import FIELDS, Image
+from oc_images.snapshot import is_snapshot, read_snapshot
+from oc_images.trace import tracer
+from oc_images.util import Priority, SingleFlight, gather, run
+
+# Suffix of every architecture in imagestream names, and its name in quay tags
+ARCHES = {
+    "x86_64": ("", "x86_64"),
+    "s390x": ("-s390x", "s390x"),
+    "ppc64le": ("-ppc64le", "ppc64le"),
+    "arm64": ("-arm64", "aarch64"),
+}
+
+
+# Imagestreams in a namespace from which fetching them all at once pays off
+BULK_THRESHOLD = 3
+
+# Annotations of payload tags that images take their commit and repo from
+COMMIT_ANNOTATION = "io.openshift.build.commit.id"
+SOURCE_ANNOTATION = "io.openshift.build.source-location"
+
+
+def compact_payload_info(info: dict) -> dict:
+    """Only the parts of `oc adm release info` output that are used
+
+    Consecutive payloads mostly carry the same images under the same names,
+    so those strings are interned to be shared between collections.
+    """
+    tags = []
+    for entry in info["references"]["spec"]["tags"]:
+        annotations = entry.get("annotations") or {}
+        tags.append(
+            {
+                "name": sys.intern(entry["name"]),
+                "from": {"name": sys.intern(entry["from"]["name"])},
+                "annotations": {
+                    key: sys.intern(annotations[key])
+                    for key in (COMMIT_ANNOTATION, SOURCE_ANNOTATION)
+                    if annotations.get(key)
+                },
+            }
+        )
+    compact = {"image": info["image"], "references": {"spec": {"tags": tags}}}
+    if "digest" in info:
+        compact["digest"] = info["digest"]
+    return compact
+
+
+def compact_is_info(info: dict) -> dict:
+    """Only the parts of `oc get is` output that are used, see above"""
+    metadata = info["metadata"]
+    tags = []
+    for entry in info["status"]["tags"] or []:
+        items = [
+            {
+                "dockerImageReference": sys.intern(item["dockerImageReference"]),
+                "generation": item.get("generation"),
+            }
+            for item in (entry.get("items") or [])[:1]
+        ]
+        tags.append({"tag": sys.intern(entry["tag"]), "items": items})
+    return {
+        "metadata": {
+            key: metadata[key]
+            for key in ("namespace", "name", "resourceVersion")
+            if key in metadata
+        },
+        "status": {"tags": tags},
+    }
 
 
 class CollectionType(Enum):
     PAYLOAD = 1
     IMAGESTREAM = 2
+    SNAPSHOT = 3
 
 
 class ImageCollection:
     def __init__(self, pointer):
         self.pointer: str = pointer
 
-        self._images = dict()
+        self._images: dict = None
         self._type: CollectionType = None
         self._name: str = ""
         self._payload_info: dict() = {}
@@ -24,7 +95,9 @@ class ImageCollection:
     @property
     def type(self):
         if not self._type:
-            if self.pointer.startswith("quay.io"):
+            if is_snapshot(self.pointer):
+                self._type = CollectionType.SNAPSHOT
+            elif self.pointer.startswith("quay.io"):
                 self._type = CollectionType.PAYLOAD
             elif self.pointer.startswith("registry.ci.openshift.org/ocp/release"):
                 self._type = CollectionType.PAYLOAD
@@ -32,6 +105,42 @@ class ImageCollection:
                 self._type = CollectionType.IMAGESTREAM
         return self._type
 
+    @property
+    def immutable(self):
+        """Whether the pointer always refers to the same payload"""
+        if self.type != CollectionType.PAYLOAD:
+            return False
+        if "@sha256:" in self.pointer:
+            return True
+        return bool(
+            re.search(
+                r"^quay\.io/openshift-release-dev/ocp-release:[0-9]+\.[0-9]+\.[0-9]+(-[er]c\.[0-9]+)?-[a-z0-9_]+$",
+                self.pointer,
+            )
+        )
+
+    def arch_pointer(self, arch: str) -> str:
+        """Pointer to the same assembly or payload, built for `arch`"""
+        suffix, tag_arch = ARCHES[arch]
+        if self.type == CollectionType.IMAGESTREAM:
+            coordinates = self.is_coordinates
+            if coordinates["namespace"] == "noname":
+                raise ValueError(f"Cannot find the imagestream of {self.pointer}")
+            namespace, name = coordinates["namespace"], coordinates["name"]
+            for other, _ in ARCHES.values():
+                if other and namespace.endswith(other) and name.endswith(other):
+                    namespace, name = namespace[: -len(other)], name[: -len(other)]
+            return f"{namespace}{suffix}/{name}{suffix}"
+
+        pointer, found = re.subn(
+            r"^(quay\.io/openshift-release-dev/ocp-release:.*)-(x86_64|s390x|ppc64le|aarch64|multi)$",
+            rf"\1-{tag_arch}",
+            self.pointer,
+        )
+        if not found:
+            raise ValueError(f"Cannot tell the other architectures of {self.pointer}")
+        return pointer
+
     async def name(self):
         if not self._name:
             if self.type == CollectionType.PAYLOAD:
@@ -42,45 +151,106 @@ class ImageCollection:
                 self._name = (
                     f"{is_info['metadata']['namespace']}/{is_info['metadata']['name']}"
                 )
+            elif self.type == CollectionType.SNAPSHOT:
+                await self.images()
         return self._name
 
     async def images(self):
-        if not self._images:
-            if self.type == CollectionType.PAYLOAD:
-                self._images = await self.get_payload_images()
-            elif self.type == CollectionType.IMAGESTREAM:
-                self._images = await self.get_is_images()
+        if self._images is None:
+            with tracer.span("load collection", "metadata", pointer=self.pointer):
+                # The tags live on as images, only the rest is kept
+                if self.type == CollectionType.PAYLOAD:
+                    self._images = await self.get_payload_images()
+                    self._payload_info = {
+                        key: value
+                        for key, value in self._payload_info.items()
+                        if key != "references"
+                    }
+                elif self.type == CollectionType.IMAGESTREAM:
+                    self._images = await self.get_is_images()
+                    self._is_info = {
+                        key: value
+                        for key, value in self._is_info.items()
+                        if key != "status"
+                    }
+                elif self.type == CollectionType.SNAPSHOT:
+                    header, self._images = read_snapshot(self.pointer)
+                    self._name = header["name"]
         return self._images
 
+    async def resolve(self, fields=FIELDS):
+        """Make sure `fields` are known for all images
+
+        Only images that miss any of them get inspected, all at once, and
+        images sharing a digest share their inspection.
+        """
+        images = await self.images()
+        pending = [i for i in images.values() if not i.resolved(fields)]
+        await gather(*[asyncio.create_task(i.obtain_info()) for i in pending])
+        return images
+
+    async def refresh(self):
+        """Forget what was loaded, and fetch the imagestream again"""
+        self._images = None
+        self._is_info = {}
+        return await self.is_info()
+
     async def get_payload_images(self):
         images = dict()
         payload_info = await self.payload_info()
         for entry in payload_info["references"]["spec"]["tags"]:
             name = entry["name"]
             pullspec = entry["from"]["name"]
-            commit = entry.get("annotations", {}).get(
-                "io.openshift.build.commit.id", ""
-            )
-            repo = entry.get("annotations", {}).get(
-                "io.openshift.build.source-location", ""
-            )
+            commit = entry.get("annotations", {}).get(COMMIT_ANNOTATION, "")
+            repo = entry.get("annotations", {}).get(SOURCE_ANNOTATION, "")
             images.update(
                 {name: Image(name=name, pullspec=pullspec, commit=commit, repo=repo)}
             )
         return images
 
     async def payload_info(self):
+        """What is used of `oc adm release info`, without the tags once the
+        images are loaded"""
+        if not self._payload_info and self.immutable:
+            if cached := metadata_cache.get(f"payload:{self.pointer}"):
+                self._payload_info = compact_payload_info(cached)
         if not self._payload_info:
             cmd = ["oc", "adm", "release", "info", "-o", "json", self.pointer]
-            self._payload_info = await run(cmd)
+            self._payload_info = compact_payload_info(
+                await run(cmd, priority=Priority.METADATA)
+            )
+            if self.immutable:
+                metadata_cache.put(f"payload:{self.pointer}", self._payload_info)
         return self._payload_info
 
     async def is_info(self):
         if not self._is_info:
             coordinates = self.is_coordinates
+            key = f"is:{coordinates['namespace']}/{coordinates['name']}"
             cmd = ["oc", "--namespace", coordinates["namespace"]]
-            cmd.extend(["get", "is", "--output", "json", coordinates["name"]])
-            self._is_info = await run(cmd)
+            cmd.extend(["get", "is", coordinates["name"]])
+
+            if indexed := await namespace_index.take(
+                coordinates["namespace"], coordinates["name"]
+            ):
+                self._is_info = indexed
+                metadata_cache.put(key, indexed, indexed["metadata"]["resourceVersion"])
+            elif version := metadata_cache.version(key):
+                # Only fetch the full imagestream when its resourceVersion moved
+                metadata = await run(
+                    cmd + ["--output", "jsonpath={.metadata}"],
+                    priority=Priority.METADATA,
+                )
+                if metadata["resourceVersion"] == version:
+                    if cached := metadata_cache.get(key, version):
+                        self._is_info = compact_is_info(cached)
+            if not self._is_info:
+                self._is_info = compact_is_info(
+                    await run(cmd + ["--output", "json"], priority=Priority.METADATA)
+                )
+                metadata_cache.put(
+                    key, self._is_info, self._is_info["metadata"]["resourceVersion"]
+                )
 
         return self._is_info
 
@@ -144,7 +314,63 @@ class ImageCollection:
         images = dict()
         is_info = await self.is_info()
         for entry in is_info["status"]["tags"]:
+            if not entry["items"]:
+                # A tag without an image, such as one that failed to import
+                continue
             name = entry["tag"]
             pullspec = entry["items"][0]["dockerImageReference"]
             images.update({name: Image(name=name, pullspec=pullspec)})
         return images
+
+
+class NamespaceIndex:
+    """Imagestreams of whole namespaces, fetched with one `oc get is` each
+
+    Once a namespace is added, every ImageCollection in it takes its
+    imagestream from here, rather than making an API call of its own. An
+    imagestream is handed out once, later lookups fetch it fresh.
+    """
+
+    def __init__(self):
+        self.namespaces: set = set()
+        self._loads = SingleFlight()
+
+    def add(self, namespace: str):
+        self.namespaces.add(namespace)
+
+    def add_for(self, collections):
+        """Add namespaces that at least BULK_THRESHOLD collections are in"""
+        counts = {}
+        for collection in collections:
+            if collection.type == CollectionType.IMAGESTREAM:
+                namespace = collection.is_coordinates["namespace"]
+                counts[namespace] = counts.get(namespace, 0) + 1
+        for namespace, count in counts.items():
+            if count >= BULK_THRESHOLD:
+                self.add(namespace)
+
+    async def _load(self, namespace: str):
+        cmd = ["oc", "--namespace", namespace, "get", "is", "--output", "json"]
+        listing = await run(cmd, priority=Priority.METADATA)
+        return {
+            item["metadata"]["name"]: compact_is_info(item) for item in listing["items"]
+        }
+
+    async def take(self, namespace: str, name: str):
+        """The imagestream from the index, or None to fetch it by itself"""
+        if namespace not in self.namespaces:
+            return None
+        try:
+            index = await self._loads.do(namespace, lambda: self._load(namespace))
+        except RuntimeError:
+            # Listing is not allowed, or failed: fall back to single fetches
+            self.namespaces.discard(namespace)
+            return None
+        return index.pop(name, None)
+
+    def clear(self):
+        self.namespaces.clear()
+        self._loads.clear()
+
+
+namespace_index = NamespaceIndex()
@@ -0,0 +1,182 @@
+import re
+import sqlite3
+import time
+from pathlib import Path
+
+from oc_images.cache import cache_dir
+from oc_images.imagecollection import CollectionType
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS collections (
+    id INTEGER PRIMARY KEY,
+    pointer TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL,
+    type TEXT NOT NULL,
+    version TEXT,
+    indexed_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS images (
+    collection_id INTEGER NOT NULL REFERENCES collections(id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    pullspec TEXT NOT NULL,
+    digest TEXT,
+    nvr TEXT,
+    commit_id TEXT,
+    repo TEXT,
+    PRIMARY KEY (collection_id, name)
+);
+CREATE INDEX IF NOT EXISTS images_digest ON images(digest);
+CREATE INDEX IF NOT EXISTS images_nvr ON images(nvr);
+CREATE INDEX IF NOT EXISTS images_commit ON images(commit_id);
+CREATE INDEX IF NOT EXISTS images_repo ON images(repo);
+"""
+
+# What a query value is matched against, by kind
+COLUMNS = {
+    "digest": "digest",
+    "nvr": "nvr",
+    "commit": "commit_id",
+    "repo": "repo",
+}
+
+
+def guess_kind(value: str) -> str:
+    """Tell from a query value whether it is a digest, commit, repo or nvr"""
+    if value.startswith("sha256:"):
+        return "digest"
+    if re.fullmatch(r"[0-9a-f]{7,40}", value):
+        return "commit"
+    if "://" in value or value.startswith("github.com/"):
+        return "repo"
+    return "nvr"
+
+
+async def collection_version(collection):
+    """What changes when the content of a collection changes, if anything"""
+    if collection.type == CollectionType.PAYLOAD:
+        return (await collection.payload_info()).get("digest") or None
+    if collection.type == CollectionType.IMAGESTREAM:
+        return (await collection.is_info())["metadata"].get("resourceVersion")
+    return None
+
+
+class ReleaseIndex:
+    """Local reverse index from images to the collections that carry them
+
+    Collections are added once resolved, and only re-indexed when their
+    payload digest or imagestream resourceVersion changed. Lookups by digest,
+    nvr, commit or source repo need no oc calls at all.
+    """
+
+    def __init__(self, path=None):
+        self.path = Path(path) if path else cache_dir() / "index.sqlite"
+        self._db = None
+
+    @property
+    def db(self):
+        if self._db is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(self.path)
+            self._db.execute("PRAGMA foreign_keys = ON")
+            self._db.executescript(SCHEMA)
+        return self._db
+
+    def indexed_version(self, pointer: str):
+        """Version the collection was indexed at, or False if it was not"""
+        row = self.db.execute(
+            "SELECT version FROM collections WHERE pointer = ?", (pointer,)
+        ).fetchone()
+        return row[0] if row else False
+
+    async def add(self, collection) -> bool:
+        """Index a collection, unless it is indexed already and did not change"""
+        version = await collection_version(collection)
+        if version is not None and self.indexed_version(collection.pointer) == version:
+            return False
+
+        images = await collection.resolve()
+        name = await collection.name()
+        rows = [
+            (
+                image.name,
+                image.pullspec,
+                image.digest,
+                await image.nvr(),
+                await image.commit(),
+                await image.repo(),
+            )
+            for image in images.values()
+        ]
+        with self.db:
+            self.db.execute(
+                "DELETE FROM collections WHERE pointer = ?", (collection.pointer,)
+            )
+            cursor = self.db.execute(
+                "INSERT INTO collections (pointer, name, type, version, indexed_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (
+                    collection.pointer,
+                    name,
+                    collection.type.name,
+                    version,
+                    time.time(),
+                ),
+            )
+            self.db.executemany(
+                f"INSERT INTO images VALUES ({cursor.lastrowid}, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+        return True
+
+    def query(self, value: str, kind: str = "", collection: str = ""):
+        """Yield the collections and images that match `value`
+
+        Commits match as a prefix, so abbreviated ones work too, everything
+        else has to match exactly. `collection` narrows down to collection
+        names that contain it.
+        """
+        kind = kind or guess_kind(value)
+        if kind == "commit":
+            condition, value = "GLOB ?", _glob_escape(value) + "*"
+        else:
+            condition = "= ?"
+        yield from self.db.execute(
+            "SELECT c.name, i.name, i.nvr, i.commit_id, i.digest"
+            " FROM images i JOIN collections c ON c.id = i.collection_id"
+            f" WHERE i.{COLUMNS[kind]} {condition} AND instr(c.name, ?)"
+            " ORDER BY c.name, i.name",
+            (value, collection),
+        )
+
+    def stats(self) -> dict:
+        if self._db is None and not self.path.exists():
+            # Connecting would create it
+            return {"path": str(self.path), "status": "absent"}
+        try:
+            size = self.path.stat().st_size
+        except OSError:
+            size = 0
+        return {
+            "path": str(self.path),
+            "collections": self.db.execute(
+                "SELECT count(*) FROM collections"
+            ).fetchone()[0],
+            "images": self.db.execute("SELECT count(*) FROM images").fetchone()[0],
+            "size_bytes": size,
+        }
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def clear(self):
+        self.close()
+        self.path.unlink(missing_ok=True)
+
+
+def _glob_escape(value: str) -> str:
+    return re.sub(r"([*?\[])", r"[\1]", value)
+
+
+release_index = ReleaseIndex()
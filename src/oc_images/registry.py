@@ -0,0 +1,287 @@
+import asyncio
+import json
+import os
+import re
+from pathlib import Path
+from urllib.parse import urlencode, urljoin, urlsplit
+
+from oc_images.util import Priority, policy, scheduler
+
+MANIFEST_LIST_TYPES = (
+    "application/vnd.docker.distribution.manifest.list.v2+json",
+    "application/vnd.oci.image.index.v1+json",
+)
+MANIFEST_TYPES = (
+    "application/vnd.docker.distribution.manifest.v2+json",
+    "application/vnd.oci.image.manifest.v1+json",
+)
+
+
+class RegistryError(Exception):
+    pass
+
+
+class Response:
+    def __init__(self, status: int, headers: dict, body: bytes):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        return json.loads(self.body)
+
+
+def parse_pullspec(pullspec: str):
+    """Split a pullspec into registry, repository and tag or digest"""
+    name, sep, reference = pullspec.partition("@")
+    if not sep:
+        reference = "latest"
+        if ":" in name.rsplit("/", 1)[-1]:
+            name, reference = name.rsplit(":", 1)
+    registry, _, repository = name.partition("/")
+    if not repository or not re.search(r"[.:]|^localhost$", registry):
+        registry, repository = "docker.io", name
+        if "/" not in repository:
+            repository = f"library/{repository}"
+    if registry == "docker.io":
+        registry = "registry-1.docker.io"
+    return registry, repository, reference
+
+
+def auth_files():
+    if path := os.environ.get("REGISTRY_AUTH_FILE"):
+        yield Path(path)
+    if runtime_dir := os.environ.get("XDG_RUNTIME_DIR"):
+        yield Path(runtime_dir) / "containers" / "auth.json"
+    yield Path.home() / ".docker" / "config.json"
+
+
+def load_credentials() -> dict:
+    credentials = {}
+    for path in auth_files():
+        try:
+            with open(path) as f:
+                auths = json.load(f).get("auths", {})
+        except (OSError, ValueError):
+            continue
+        for host, entry in auths.items():
+            host = re.sub(r"^https?://", "", host).split("/")[0]
+            if "auth" in entry:
+                credentials.setdefault(host, entry["auth"])
+    return credentials
+
+
+class ConnectionPool:
+    """Minimal HTTP/1.1 client that keeps connections open per host"""
+
+    def __init__(self, max_idle: int = 8):
+        self.max_idle = max_idle
+        self._idle: dict = {}
+        self._ssl = None
+
+    def _ssl_context(self):
+        if self._ssl is None:
+            import ssl
+
+            self._ssl = ssl.create_default_context()
+        return self._ssl
+
+    async def _connect(self, scheme, host, port):
+        ssl = self._ssl_context() if scheme == "https" else None
+        return await asyncio.open_connection(host, port, ssl=ssl)
+
+    async def request(self, url: str, headers: dict) -> Response:
+        parts = urlsplit(url)
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        key = (parts.scheme, parts.hostname, port)
+        path = parts.path + (f"?{parts.query}" if parts.query else "")
+        lines = [f"GET {path or '/'} HTTP/1.1", f"Host: {parts.netloc}"]
+        lines.extend(f"{k}: {v}" for k, v in headers.items())
+        request = ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+        while True:
+            idle = self._idle.get(key)
+            reused = bool(idle)
+            reader, writer = idle.pop() if idle else await self._connect(*key)
+            try:
+                writer.write(request)
+                await writer.drain()
+                response, keep_alive = await self._read_response(reader)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                writer.close()
+                if reused:
+                    # The server closed an idle connection, try a fresh one
+                    continue
+                raise
+            except BaseException:
+                # Timed out half way through a response, which leaves the
+                # connection unusable
+                writer.close()
+                raise
+            if keep_alive and len(self._idle.setdefault(key, [])) < self.max_idle:
+                self._idle[key].append((reader, writer))
+            else:
+                writer.close()
+            return response
+
+    async def _read_response(self, reader):
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError("Connection closed by server")
+        version, status, *_ = status_line.decode("latin-1").split(" ", 2)
+        headers = {}
+        while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        keep_alive = (
+            version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+        )
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while size := int((await reader.readline()).split(b";")[0], 16):
+                chunks.append(await reader.readexactly(size))
+                await reader.readexactly(2)
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            body = b"".join(chunks)
+        elif "content-length" in headers:
+            body = await reader.readexactly(int(headers["content-length"]))
+        elif int(status) in (204, 304):
+            body = b""
+        else:
+            body = await reader.read()
+            keep_alive = False
+        return Response(int(status), headers, body), keep_alive
+
+    def close(self):
+        for connections in self._idle.values():
+            for _, writer in connections:
+                writer.close()
+        self._idle.clear()
+
+
+class RegistryClient:
+    """Read image labels straight from the registry
+
+    This fetches the manifest and config blob over pooled connections, rather
+    than starting an `oc image info` process per image.
+    """
+
+    def __init__(self, platform: str = "linux/amd64", insecure=()):
+        self.fallbacks = 0
+        # Whether the pool outlives a command, as it does in `serve`
+        self.keep_open = False
+        self.platform = platform
+        self.insecure = set(insecure)
+        self.pool = ConnectionPool()
+
+        self._credentials = None
+        self._tokens: dict = {}
+
+    @property
+    def credentials(self):
+        if self._credentials is None:
+            self._credentials = load_credentials()
+        return self._credentials
+
+    def _base_url(self, registry):
+        scheme = "http" if registry in self.insecure else "https"
+        return f"{scheme}://{registry}/v2/"
+
+    async def _token(self, registry, challenge: str):
+        scheme, _, params = challenge.partition(" ")
+        auth = self.credentials.get(registry)
+        if scheme.lower() == "basic":
+            if not auth:
+                raise RegistryError(f"No credentials for {registry}")
+            return f"Basic {auth}"
+
+        params = dict(re.findall(r'(\w+)="([^"]*)"', params))
+        realm = params.pop("realm", "")
+        headers = {"Authorization": f"Basic {auth}"} if auth else {}
+        response = await self.pool.request(f"{realm}?{urlencode(params)}", headers)
+        if response.status != 200:
+            raise RegistryError(f"Token request to {realm} failed: {response.status}")
+        token = response.json()
+        return f"Bearer {token.get('token') or token.get('access_token')}"
+
+    async def get(self, registry: str, repository: str, path: str, accept=()):
+        url = urljoin(self._base_url(registry), f"{repository}/{path}")
+        headers = {"Accept": ", ".join(accept)} if accept else {}
+        if token := self._tokens.get((registry, repository)):
+            headers["Authorization"] = token
+
+        authenticated = False
+        for _ in range(5):
+            response = await self.pool.request(url, headers)
+            if response.status == 401 and not authenticated:
+                # No token yet, or the cached one expired
+                authenticated = True
+                challenge = response.headers.get("www-authenticate", "")
+                token = await self._token(registry, challenge)
+                self._tokens[(registry, repository)] = token
+                headers["Authorization"] = token
+            elif response.status in (301, 302, 303, 307, 308):
+                location = urljoin(url, response.headers["location"])
+                if urlsplit(location).netloc != urlsplit(url).netloc:
+                    # Blobs get redirected to storage that has its own auth
+                    headers.pop("Authorization", None)
+                url = location
+            elif response.status == 200:
+                return response
+            else:
+                raise RegistryError(f"GET {url} returned {response.status}")
+        raise RegistryError(f"GET {url} did not resolve")
+
+    async def image_info(self, pullspec: str) -> dict:
+        """Return the manifest digests and config of a pullspec
+
+        Like an oc process, this gives up after the timeout of the run policy.
+        """
+        registry, repository, reference = parse_pullspec(pullspec)
+        accept = MANIFEST_LIST_TYPES + MANIFEST_TYPES
+
+        async with (
+            scheduler.slot(Priority.INSPECT),
+            asyncio.timeout(policy.timeout or None),
+        ):
+            response = await self.get(
+                registry, repository, f"manifests/{reference}", accept
+            )
+            manifest = response.json()
+            digest = response.headers.get("docker-content-digest", "")
+            list_digest = ""
+
+            media_type = manifest.get("mediaType", response.headers.get("content-type"))
+            if media_type in MANIFEST_LIST_TYPES or "manifests" in manifest:
+                list_digest = digest
+                digest = self._select_platform(manifest, pullspec)
+                response = await self.get(
+                    registry, repository, f"manifests/{digest}", MANIFEST_TYPES
+                )
+                manifest = response.json()
+
+            config_digest = manifest["config"]["digest"]
+            config = (
+                await self.get(registry, repository, f"blobs/{config_digest}")
+            ).json()
+
+        return {"digest": digest, "listDigest": list_digest, "config": config}
+
+    def _select_platform(self, manifest_list: dict, pullspec: str):
+        os_name, _, architecture = self.platform.partition("/")
+        for entry in manifest_list["manifests"]:
+            platform = entry.get("platform", {})
+            if (
+                platform.get("os") == os_name
+                and platform.get("architecture") == architecture
+            ):
+                return entry["digest"]
+        raise RegistryError(f"{pullspec} has no manifest for {self.platform}")
+
+    def close(self):
+        self.pool.close()
+
+
+registry_client = RegistryClient()
@@ -0,0 +1,56 @@
+import asyncio
+import json
+
+from oc_images.image import Image
+from oc_images.transport import open_text
+from oc_images.util import as_completed
+
+SNAPSHOT_VERSION = 1
+SUFFIXES = (".ndjson", ".ndjson.gz")
+
+
+def is_snapshot(pointer: str) -> bool:
+    return pointer.endswith(SUFFIXES)
+
+
+async def write_snapshot(collection, path) -> int:
+    """Write a collection with all image metadata as newline delimited JSON
+
+    The first line describes the collection, every next line one image. Lines
+    are written as soon as their image is inspected.
+    """
+    images = await collection.images()
+    header = {
+        "snapshot": SNAPSHOT_VERSION,
+        "pointer": collection.pointer,
+        "name": await collection.name(),
+        "type": collection.type.name,
+    }
+
+    async def resolve(image):
+        await image.nvr()
+        return image
+
+    with open_text(path, "w") as f:
+        f.write(json.dumps(header, separators=(",", ":")) + "\n")
+        tasks = [asyncio.create_task(resolve(image)) for image in images.values()]
+        async for image in as_completed(tasks):
+            record = {"name": image.name, "pullspec": image.pullspec}
+            record.update(image.export_info())
+            f.write(json.dumps(record, separators=(",", ":")) + "\n")
+    return len(tasks)
+
+
+def read_snapshot(path):
+    """Return the header and the images of a snapshot"""
+    images = dict()
+    with open_text(path, "r") as f:
+        header = json.loads(f.readline())
+        if header.get("snapshot") != SNAPSHOT_VERSION:
+            raise ValueError(f"{path} is not a snapshot of a supported version")
+        for line in f:
+            record = json.loads(line)
+            image = Image(name=record.pop("name"), pullspec=record.pop("pullspec"))
+            image.apply_info(record)
+            images[image.name] = image
+    return header, images
@@ -0,0 +1,146 @@
+import contextlib
+import json
+import math
+import os
+import time
+from dataclasses import dataclass, field
+
+
+@dataclass
+class Span:
+    name: str
+    category: str
+    start: float
+    end: float
+    args: dict = field(default_factory=dict)
+
+    @property
+    def duration(self):
+        return self.end - self.start
+
+
+def percentile(values: list, p: float):
+    """Nearest-rank percentile"""
+    ordered = sorted(values)
+    return ordered[max(math.ceil(p / 100 * len(ordered)) - 1, 0)]
+
+
+class Tracer:
+    """Collect timing spans of external calls, for --stats and --trace"""
+
+    def __init__(self):
+        self.enabled = False
+        self.spans: list = []
+        self.origin = time.perf_counter()
+
+    def reset(self):
+        self.spans = []
+        self.origin = time.perf_counter()
+
+    @contextlib.contextmanager
+    def span(self, name: str, category: str, /, **args):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.spans.append(Span(name, category, start, time.perf_counter(), args))
+
+    def by_category(self, *categories):
+        return [s for s in self.spans if s.category in categories]
+
+    def concurrency(self, category: str = "subprocess"):
+        """Return average and peak number of overlapping spans"""
+        spans = self.by_category(category)
+        if not spans:
+            return 0.0, 0
+        events = sorted(
+            [(s.start, 1) for s in spans] + [(s.end, -1) for s in spans],
+        )
+        current = peak = 0
+        for _, delta in events:
+            current += delta
+            peak = max(peak, current)
+        busy = max(s.end for s in spans) - min(s.start for s in spans)
+        average = sum(s.duration for s in spans) / busy if busy else float(peak)
+        return average, peak
+
+    def critical_path(self):
+        """Chain of work spans that, back to back, made up the wall time"""
+        spans = self.by_category("subprocess", "registry", "render")
+        path = []
+        current = max(spans, key=lambda s: s.end, default=None)
+        while current:
+            path.append(current)
+            earlier = [s for s in spans if s.end <= current.start]
+            current = max(earlier, key=lambda s: s.end, default=None)
+        return list(reversed(path))
+
+    def summary(self, counters: dict = None) -> str:
+        wall = time.perf_counter() - self.origin
+        lines = [f"Wall time: {wall:.3f}s"]
+
+        average, peak = self.concurrency()
+        lines.append(f"Concurrency: {average:.1f} average, {peak} peak oc processes")
+
+        lines.append(
+            f"{'call':<24} {'count':>6} {'p50':>8} {'p95':>8} {'max':>8} {'total':>9}"
+        )
+        names = sorted({(s.category, s.name) for s in self.spans})
+        for category, name in names:
+            durations = [
+                s.duration
+                for s in self.spans
+                if s.category == category and s.name == name
+            ]
+            lines.append(
+                f"{name:<24} {len(durations):>6}"
+                f" {percentile(durations, 50):>7.3f}s"
+                f" {percentile(durations, 95):>7.3f}s"
+                f" {max(durations):>7.3f}s"
+                f" {sum(durations):>8.3f}s"
+            )
+
+        for name, (hits, misses) in (counters or {}).items():
+            lines.append(f"Cache {name}: {hits} hits, {misses} misses")
+
+        path = self.critical_path()
+        if path:
+            steps = " -> ".join(f"{s.name} ({s.duration:.3f}s)" for s in path[:10])
+            if len(path) > 10:
+                steps += f" -> ... {len(path) - 10} more"
+            lines.append(f"Critical path: {steps}")
+        return "\n".join(lines)
+
+    def write_trace(self, path):
+        """Write spans as Chrome/Perfetto trace event JSON"""
+        # Put overlapping spans on separate lanes, so concurrency is visible
+        lanes: list = []
+        events = []
+        for span in sorted(self.spans, key=lambda s: s.start):
+            for lane, end in enumerate(lanes):
+                if end <= span.start:
+                    break
+            else:
+                lane = len(lanes)
+                lanes.append(0)
+            lanes[lane] = span.end
+            events.append(
+                {
+                    "name": span.name,
+                    "cat": span.category,
+                    "ph": "X",
+                    "ts": round((span.start - self.origin) * 1e6),
+                    "dur": round(span.duration * 1e6),
+                    "pid": os.getpid(),
+                    "tid": lane,
+                    "args": span.args,
+                }
+            )
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+
+tracer = Tracer()
@@ -0,0 +1,113 @@
+import asyncio
+import gzip
+import json
+import time
+from collections import deque
+
+CASSETTE_VERSION = 1
+
+
+def open_text(path, mode):
+    """Open a text file, gzip compressed if its name ends in .gz"""
+    if str(path).endswith(".gz"):
+        return gzip.open(path, mode + "t")
+    return open(path, mode)
+
+
+async def spawn(cmd):
+    """Run a command as a process, and return its exit code, stdout and stderr"""
+    proc = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    try:
+        stdout, stderr = await proc.communicate()
+    except BaseException:
+        # Timed out, or cancelled because something else failed
+        if proc.returncode is None:
+            proc.kill()
+            await asyncio.shield(proc.wait())
+        raise
+    return proc.returncode, stdout, stderr
+
+
+class Transport:
+    """Where the output of commands comes from
+
+    Commands run as processes, unless they are replayed from a cassette. While
+    recording, every command that completes is kept with its exit code,
+    output and latency, to be saved to a cassette at the end.
+    """
+
+    def __init__(self):
+        self.path = None
+        self.recording: list = None
+        self.replies: dict = None
+        # Factor on the recorded latency when replaying, 0 to not wait at all
+        self.scale = 1.0
+
+    def reset(self):
+        self.__init__()
+
+    def record(self, path):
+        self.reset()
+        self.path = path
+        self.recording = []
+
+    def replay(self, path, scale: float = 1.0):
+        self.reset()
+        self.path = path
+        self.scale = scale
+        with open_text(path, "r") as f:
+            cassette = json.load(f)
+        if cassette.get("cassette") != CASSETTE_VERSION:
+            raise ValueError(f"{path} is not a cassette of version {CASSETTE_VERSION}")
+        self.replies = {}
+        for interaction in cassette["interactions"]:
+            key = tuple(interaction["cmd"])
+            self.replies.setdefault(key, deque()).append(interaction)
+
+    async def execute(self, cmd):
+        if self.replies is not None:
+            return await self._replay(cmd)
+        started = time.perf_counter()
+        returncode, stdout, stderr = await spawn(cmd)
+        if self.recording is not None:
+            self.recording.append(
+                {
+                    "cmd": list(cmd),
+                    "returncode": returncode,
+                    "latency": round(time.perf_counter() - started, 6),
+                    "stdout": stdout.decode(errors="surrogateescape"),
+                    "stderr": stderr.decode(errors="surrogateescape"),
+                }
+            )
+        return returncode, stdout, stderr
+
+    async def _replay(self, cmd):
+        replies = self.replies.get(tuple(cmd))
+        if not replies:
+            return 1, b"", f"error: {' '.join(cmd)} is not in {self.path}".encode()
+        # Replies to the same command come in recorded order, the last one
+        # keeps coming after that
+        interaction = replies.popleft() if len(replies) > 1 else replies[0]
+        if self.scale:
+            await asyncio.sleep(interaction["latency"] * self.scale)
+        return (
+            interaction["returncode"],
+            interaction["stdout"].encode(errors="surrogateescape"),
+            interaction["stderr"].encode(errors="surrogateescape"),
+        )
+
+    def close(self):
+        """Write what was recorded to the cassette, and run processes again"""
+        if self.recording is not None:
+            with open_text(self.path, "w") as f:
+                json.dump(
+                    {"cassette": CASSETTE_VERSION, "interactions": self.recording}, f
+                )
+        self.reset()
+
+
+transport = Transport()
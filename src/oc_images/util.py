@@ -1,13 +1,375 @@
 import asyncio
+import contextlib
+import contextvars
+import heapq
+import itertools
 import json
-import subprocess
+import os
+import random
+import re
+import time
+from collections import Counter, deque
+from enum import IntEnum
 
+from oc_images.trace import percentile, tracer
+from oc_images.transport import transport
 
-async def run(cmd):
-    proc = await asyncio.create_subprocess_shell(
-        " ".join(cmd), stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
-    )
-    stdout, stderr = await proc.communicate()
-    if proc.returncode != 0:
-        raise RuntimeError(f"Process {cmd} failed with error {stderr}")
+# stderr of oc that is worth another try: throttling, gateway and network errors
+TRANSIENT_ERRORS = re.compile(
+    r"\b(429|500|502|503|504)\b|too many requests|service unavailable"
+    r"|timed? ?out|connection (reset|refused)|broken pipe|unexpected EOF"
+    r"|TLS handshake|no such host|temporary failure",
+    re.IGNORECASE,
+)
+
+
+class Priority(IntEnum):
+    METADATA = 0
+    INSPECT = 1
+    # Work nobody asked for yet, in case it is needed later
+    SPECULATIVE = 2
+
+
+def default_jobs() -> int:
+    # The processes mostly wait on the network, so allow more than one per core
+    return min(32, (os.cpu_count() or 1) * 2)
+
+
+class Scheduler:
+    """Bound the number of concurrently running subprocesses.
+
+    Waiters are woken up by priority, then in order of arrival, so metadata
+    fetches that unlock more work go ahead of queued image inspections.
+    Speculative work only gets half of the slots, and no more than
+    `speculative` of them at once, so that it never holds up the work that is
+    needed now and little of it is wasted when it turns out to be unneeded.
+    """
+
+    def __init__(self, jobs: int = 0, speculative: int = 2):
+        self.jobs = jobs or default_jobs()
+        self.speculative = speculative
+        self.running = 0
+        # How many of the running slots were handed out to speculative work
+        self.speculating = 0
+        self._waiters: list = []
+        self._counter = itertools.count()
+
+    def _may_run(self, priority: Priority) -> bool:
+        if priority >= Priority.SPECULATIVE:
+            return (
+                self.running < max(1, self.jobs // 2)
+                and self.speculating < self.speculative
+            )
+        return self.running < self.jobs
+
+    def _grant(self, priority: Priority) -> Priority:
+        self.running += 1
+        if priority >= Priority.SPECULATIVE:
+            self.speculating += 1
+        return priority
+
+    async def acquire(self, priority: Priority = Priority.INSPECT, claim=None):
+        """Wait for a slot, and return the priority it was handed out at"""
+        if claim is not None:
+            priority = claim.priority
+        self._dispatch()
+        if self._may_run(priority) and (
+            not self._waiters or priority < self._waiters[0][0]
+        ):
+            return self._grant(priority)
+        future = asyncio.get_running_loop().create_future()
+        if claim is not None:
+            claim.future = future
+        self._push(priority, future)
+        try:
+            return await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was handed over just before we got cancelled
+                self.release(future.result())
+            raise
+
+    def _push(self, priority: Priority, future):
+        heapq.heappush(self._waiters, (priority, next(self._counter), future))
+        self._dispatch()
+
+    def _dispatch(self):
+        """Hand free slots to the first waiters that may have them"""
+        while self._waiters:
+            priority, _, future = self._waiters[0]
+            if future.done():
+                # Cancelled, or an old entry of a promoted claim
+                heapq.heappop(self._waiters)
+                continue
+            if not self._may_run(priority):
+                return
+            heapq.heappop(self._waiters)
+            future.set_result(self._grant(priority))
+
+    def release(self, priority: Priority = Priority.INSPECT):
+        self.running -= 1
+        if priority >= Priority.SPECULATIVE:
+            self.speculating -= 1
+        self._dispatch()
+
+    @contextlib.asynccontextmanager
+    async def slot(self, priority: Priority = Priority.INSPECT, claim=None):
+        granted = await self.acquire(priority, claim)
+        try:
+            yield
+        finally:
+            self.release(granted)
+
+
+class Claim:
+    """Priority of speculative work, to raise once somebody needs its result
+
+    Subprocesses started while a claim is the `current_claim` wait for a
+    slot at the priority of the claim, instead of their own.
+    """
+
+    def __init__(self, priority: Priority = Priority.SPECULATIVE):
+        self.priority = priority
+        # What the work waits on for a slot, if it does
+        self.future = None
+
+    def promote(self, priority: Priority = Priority.INSPECT):
+        self.priority = min(self.priority, priority)
+        if self.future is not None and not self.future.done():
+            # The old entry is skipped once the new one got the slot
+            scheduler._push(self.priority, self.future)
+
+
+# The claim of the speculative work running in the current task, if any
+current_claim = contextvars.ContextVar("current_claim", default=None)
+
+
+class SingleFlight:
+    """Share one call, and its result, between all callers of the same key.
+
+    Failed calls are forgotten, so that a later caller can try again. The
+    call is cancelled once every caller waiting for it was cancelled.
+    """
+
+    def __init__(self):
+        self._calls: dict = {}
+        self._waiting = Counter()
+
+    def start(self, key, fn):
+        """Start the call for key, unless it runs already, without waiting"""
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda t: self._forget_failed(key, t))
+        return task
+
+    async def do(self, key, fn):
+        task = self.start(key, fn)
+        # One impatient caller must not cancel the call for everyone else
+        self._waiting[task] += 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if self._waiting[task] == 1:
+                task.cancel()
+            raise
+        finally:
+            self._waiting[task] -= 1
+            if not self._waiting[task]:
+                del self._waiting[task]
+
+    def abandon(self, key):
+        """Cancel the call for key, if it runs and nobody waits for it"""
+        task = self._calls.get(key)
+        if task is not None and not task.done() and not self._waiting[task]:
+            task.cancel()
+
+    def _forget_failed(self, key, task):
+        if (task.cancelled() or task.exception()) and self._calls.get(key) is task:
+            del self._calls[key]
+
+    def clear(self):
+        self._calls.clear()
+
+
+async def cancel(tasks):
+    """Cancel tasks, and wait until they have cleaned up"""
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def cancel_outstanding(loop):
+    """Cancel what is left running on the loop, killing its oc processes"""
+    tasks = [task for task in asyncio.all_tasks(loop) if not task.done()]
+    loop.run_until_complete(cancel(tasks))
+
+
+async def gather(*aws):
+    """Like asyncio.gather, but cancel all others as soon as one fails"""
+    tasks = [asyncio.ensure_future(aw) for aw in aws]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        await cancel(tasks)
+        raise
+
+
+async def as_completed(tasks):
+    try:
+        for task in asyncio.as_completed(tasks):
+            yield await task
+    finally:
+        await cancel(tasks)
+
+
+async def merge(*generators):
+    """Yield the items of several async generators, as they come in"""
+    queue = asyncio.Queue()
+    finished = object()
+
+    async def drain(generator):
+        try:
+            async for item in generator:
+                await queue.put(item)
+        finally:
+            await queue.put(finished)
+
+    tasks = [asyncio.create_task(drain(g)) for g in generators]
+    try:
+        running = len(tasks)
+        while running:
+            item = await queue.get()
+            if item is finished:
+                running -= 1
+                # Raise the error of a generator that failed
+                for task in tasks:
+                    if task.done() and task.exception():
+                        raise task.exception()
+                continue
+            yield item
+    finally:
+        await cancel(tasks)
+
+
+async def in_order(tasks):
+    # Results that finish early wait in their task until all before are out
+    try:
+        for task in tasks:
+            yield await task
+    finally:
+        await cancel(tasks)
+
+
+class CommandError(RuntimeError):
+    def __init__(self, cmd, returncode: int, stderr: bytes):
+        super().__init__(f"Process {cmd} failed with error {stderr}")
+        self.cmd = cmd
+        self.returncode = returncode
+        self.stderr = stderr
+
+    @property
+    def transient(self) -> bool:
+        return bool(TRANSIENT_ERRORS.search(self.stderr.decode(errors="replace")))
+
+
+class CommandTimeout(CommandError):
+    def __init__(self, cmd, timeout: float):
+        super().__init__(cmd, None, f"timed out after {timeout}s".encode())
+
+
+class RunPolicy:
+    """Timeouts, retries and hedging of oc processes
+
+    Transient failures are retried after an exponential backoff with full
+    jitter. With `hedge` set, an image inspection that takes longer than the
+    95th percentile of earlier ones gets a duplicate, and the first one to
+    finish wins.
+    """
+
+    MIN_SAMPLES = 20
+
+    def __init__(self, timeout: float = 120, retries: int = 3, hedge: bool = False):
+        self.timeout = timeout
+        self.retries = retries
+        self.hedge = hedge
+        self.backoff_base = 0.5
+        self.backoff_max = 10.0
+        self.latencies = deque(maxlen=500)
+
+        self.retried = 0
+        self.timeouts = 0
+        self.hedged = 0
+
+    def backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2**attempt))
+
+    def hedge_delay(self):
+        if not self.hedge or len(self.latencies) < self.MIN_SAMPLES:
+            return None
+        return percentile(self.latencies, 95)
+
+
+scheduler = Scheduler()
+policy = RunPolicy()
+
+
+def command_name(cmd) -> str:
+    line = " ".join(cmd)
+    for name in ("adm release info", "image info", "get is"):
+        if f" {name} " in line:
+            return f"oc {name}"
+    return cmd[0]
+
+
+async def _exec(cmd, priority: Priority):
+    queued = time.perf_counter()
+    async with scheduler.slot(priority, current_claim.get()):
+        started = time.perf_counter()
+        waited = round(started - queued, 6)
+        with tracer.span(command_name(cmd), "subprocess", cmd=cmd, waited=waited):
+            try:
+                async with asyncio.timeout(policy.timeout or None):
+                    returncode, stdout, stderr = await transport.execute(cmd)
+            except TimeoutError:
+                policy.timeouts += 1
+                raise CommandTimeout(cmd, policy.timeout) from None
+    if returncode != 0:
+        raise CommandError(cmd, returncode, stderr)
+    if priority == Priority.INSPECT:
+        policy.latencies.append(time.perf_counter() - started)
+    return stdout
+
+
+async def _hedged(cmd, priority: Priority):
+    delay = policy.hedge_delay() if priority == Priority.INSPECT else None
+    tasks = [asyncio.ensure_future(_exec(cmd, priority))]
+    try:
+        if delay is not None:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                policy.hedged += 1
+                tasks.append(asyncio.ensure_future(_exec(cmd, priority)))
+        error = None
+        for task in asyncio.as_completed(tasks):
+            try:
+                return await task
+            except CommandError as e:
+                error = error or e
+        raise error
+    finally:
+        await cancel(tasks)
+
+
+async def run(cmd, priority: Priority = Priority.INSPECT):
+    for attempt in itertools.count():
+        try:
+            stdout = await _hedged(cmd, priority)
+            break
+        except CommandError as error:
+            if not error.transient or attempt >= policy.retries:
+                raise
+        policy.retried += 1
+        await asyncio.sleep(policy.backoff(attempt))
     return json.loads(stdout)
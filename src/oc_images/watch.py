@@ -0,0 +1,75 @@
+import asyncio
+from datetime import datetime
+
+from oc_images.image import Image
+from oc_images.imagecollection import CollectionType, ImageCollection
+from oc_images.util import gather
+
+
+class Watcher:
+    """Follow an imagestream, reporting the tags that change between polls"""
+
+    def __init__(self, pointer: str):
+        self.collection = ImageCollection(pointer)
+        if self.collection.type != CollectionType.IMAGESTREAM:
+            raise ValueError(f"{pointer} is not an imagestream")
+
+        # tag -> (generation, digest) of its most recent item
+        self.snapshot: dict = {}
+        self.polls = 0
+
+    async def poll(self):
+        is_info = await self.collection.refresh()
+        current = {}
+        images = {}
+        for entry in is_info["status"]["tags"]:
+            if not entry["items"]:
+                # Never imported, or its import failed
+                continue
+            item = entry["items"][0]
+            image = Image(name=entry["tag"], pullspec=item["dockerImageReference"])
+            current[entry["tag"]] = (
+                item.get("generation"),
+                image.digest or image.pullspec,
+            )
+            images[entry["tag"]] = image
+
+        first_poll = not self.polls
+        self.polls += 1
+        previous, self.snapshot = self.snapshot, current
+        if first_poll:
+            return []
+
+        events = []
+        for tag in sorted(current.keys() | previous.keys()):
+            if tag not in current:
+                events.append(("removed", tag, None))
+            elif tag not in previous:
+                events.append(("added", tag, images[tag]))
+            elif current[tag][1] != previous[tag][1]:
+                events.append(("changed", tag, images[tag]))
+            elif current[tag][0] != previous[tag][0]:
+                # Imported again, but to the digest it already had
+                events.append(("reimported", tag, None))
+
+        # Only tags that point to new content get inspected
+        await gather(
+            *[asyncio.create_task(image.nvr()) for _, _, image in events if image]
+        )
+        return events
+
+    async def watch(self, interval: float, count: int = None):
+        while True:
+            events = await self.poll()
+            yield events
+            if count and self.polls >= count:
+                return
+            await asyncio.sleep(interval)
+
+
+async def format_event(event):
+    kind, tag, image = event
+    line = f"{datetime.now().isoformat(timespec='seconds')} {kind} {tag}"
+    if image:
+        line += f" {await image.nvr()}"
+    return line
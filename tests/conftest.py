@@ -0,0 +1,22 @@
+from unittest.mock import patch
+
+import pytest
+
+from oc_images.cache import ImageCache
+from oc_images.util import SingleFlight
+
+
+@pytest.fixture
+def inspections():
+    """Inspections that are not shared with other tests"""
+    inspections = SingleFlight()
+    with patch("oc_images.image.inspections", inspections):
+        yield inspections
+
+
+@pytest.fixture
+def image_cache(tmp_path, inspections):
+    """An empty image cache, so that every image gets inspected"""
+    cache = ImageCache(path=tmp_path / "images.json")
+    with patch("oc_images.image.image_cache", cache):
+        yield cache
@@ -0,0 +1,49 @@
+import json
+import subprocess
+import sys
+
+
+def test_benchmark_suite_runs_offline():
+    result = subprocess.run(
+        [
+            sys.executable,
+            "benchmarks/bench.py",
+            "--sizes",
+            "10",
+            "--latency",
+            "0",
+            "--jitter",
+            "0",
+            "--json",
+        ],
+        capture_output=True,
+        check=True,
+        text=True,
+    )
+    results = {r["scenario"]: r for r in json.loads(result.stdout)}
+    assert all(r["exit_code"] == 0 for r in results.values())
+    assert results["list"]["oc_calls"] == 11
+    assert results["list"]["output_lines"] == 10
+    assert results["list (warm cache)"]["oc_calls"] == 0
+    assert results["diff payloads"]["oc_calls_by_kind"]["RELEASE"] == 2
+
+
+def test_memory_benchmark_runs_offline():
+    result = subprocess.run(
+        [
+            sys.executable,
+            "benchmarks/memory.py",
+            "--size",
+            "20",
+            "--collections",
+            "2",
+            "--inspect",
+            "--json",
+        ],
+        capture_output=True,
+        check=True,
+        text=True,
+    )
+    result = json.loads(result.stdout)
+    assert result["images"] == 40
+    assert result["retained_mb"] > 0
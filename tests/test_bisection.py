@@ -0,0 +1,58 @@
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+pytest_plugins = ("pytest_asyncio",)
+
+from oc_images.bisection import Bisector
+
+REPO = "quay.io/openshift-release-dev/ocp-v4.0-art-dev"
+
+
+def nightly(day: int):
+    return f"registry.ci.openshift.org/ocp/release:4.20.0-0.nightly-2025-06-{day:02}-000000"
+
+
+def payload_info(pointer: str, digest: str):
+    return {
+        "image": pointer,
+        "references": {
+            "spec": {
+                "tags": [{"name": "installer", "from": {"name": f"{REPO}@{digest}"}}]
+            }
+        },
+    }
+
+
+@pytest.mark.parametrize("changed_on", [2, 9, 17, 30])
+@pytest.mark.asyncio
+async def test_bisect(changed_on):
+    pointers = [nightly(day) for day in range(1, 31)]
+
+    async def fake_run(cmd, priority=None):
+        day = pointers.index(cmd[-1]) + 1
+        digest = "sha256:new" if day >= changed_on else "sha256:old"
+        return payload_info(cmd[-1], digest)
+
+    run = AsyncMock(side_effect=fake_run)
+    with patch("oc_images.imagecollection.run", run):
+        bisector = Bisector("installer", pointers)
+        (last_good, good_image), (first_bad, bad_image) = await bisector.bisect()
+
+    assert last_good.pointer == nightly(changed_on - 1)
+    assert first_bad.pointer == nightly(changed_on)
+    assert (good_image.digest, bad_image.digest) == ("sha256:old", "sha256:new")
+    # Good and bad, then about log2(28) probes
+    assert run.await_count <= 2 + 5
+
+
+@pytest.mark.asyncio
+async def test_bisect_unchanged():
+    pointers = [nightly(1), nightly(2)]
+
+    async def fake_run(cmd, priority=None):
+        return payload_info(cmd[-1], "sha256:same")
+
+    with patch("oc_images.imagecollection.run", AsyncMock(side_effect=fake_run)):
+        with pytest.raises(ValueError, match="the same"):
+            await Bisector("installer", pointers).bisect()
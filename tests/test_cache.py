@@ -0,0 +1,128 @@
+import json
+import os
+from unittest.mock import Mock
+
+import pytest
+
+from oc_images.cache import ImageCache, MetadataCache
+
+INFO = {
+    "version": "v4.20.0",
+    "release": "202504141045.p0.g9de7792.assembly.stream.el9",
+    "commit": "9de7792",
+    "component": "ironic-container",
+    "repo": "https://github.com/openshift/ironic-image",
+    "release_operator": False,
+}
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ImageCache(path=tmp_path / "images.json", max_entries=3)
+
+
+def test_miss_then_hit(cache):
+    assert cache.get("sha256:aaa") is None
+    cache.put("sha256:aaa", INFO)
+    assert cache.get("sha256:aaa") == INFO
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_persisted(cache):
+    cache.put("sha256:aaa", INFO)
+    cache.save()
+    reloaded = ImageCache(path=cache.path)
+    assert reloaded.get("sha256:aaa") == INFO
+    assert not cache.stats_path.exists()
+    reloaded.save()
+    assert json.loads(cache.stats_path.read_text()) == {"hits": 1, "misses": 0}
+
+
+def test_lru_eviction(cache):
+    for digest in ["sha256:a", "sha256:b", "sha256:c"]:
+        cache.put(digest, INFO)
+    cache.get("sha256:a")
+    cache.put("sha256:d", INFO)
+    cache.save()
+    assert list(ImageCache(path=cache.path).entries) == [
+        "sha256:c",
+        "sha256:a",
+        "sha256:d",
+    ]
+
+
+def test_hits_do_not_rewrite_entries(cache):
+    cache.put("sha256:a", INFO)
+    cache.put("sha256:b", INFO)
+    cache.save()
+    written = cache.path.stat().st_mtime_ns
+    os.utime(cache.path, ns=(written - 10**9, written - 10**9))
+
+    reloaded = ImageCache(path=cache.path, max_entries=3)
+    assert reloaded.get("sha256:a") == INFO
+    reloaded.save()
+    assert cache.path.stat().st_mtime_ns == written - 10**9
+    assert reloaded.stats()["hits"] == 1
+
+    # The order of hits is kept with the next addition
+    reloaded.put("sha256:c", INFO)
+    reloaded.save()
+    assert list(ImageCache(path=cache.path).entries) == [
+        "sha256:b",
+        "sha256:a",
+        "sha256:c",
+    ]
+
+
+def test_disabled(cache):
+    cache.enabled = False
+    cache.put("sha256:aaa", INFO)
+    assert cache.get("sha256:aaa") is None
+    cache.save()
+    assert not cache.path.exists()
+
+
+def test_save_merges_other_writers(cache):
+    other = ImageCache(path=cache.path)
+    other.put("sha256:other", INFO)
+    other.save()
+    cache.put("sha256:mine", INFO)
+    cache.save()
+    assert set(ImageCache(path=cache.path).entries) == {"sha256:other", "sha256:mine"}
+
+
+def test_clear(cache):
+    cache.put("sha256:aaa", INFO)
+    cache.save()
+    cache.clear()
+    assert not cache.path.exists()
+    assert cache.stats()["entries"] == 0
+
+
+def test_metadata_kept_in_memory(tmp_path):
+    cache = MetadataCache(path=tmp_path, memory_entries=1)
+    cache.put("payload:a", {"image": "a"})
+    cache.put("payload:b", {"image": "b"})
+    # Only the most recent entry stays in memory, the rest is read from disk
+    for f in tmp_path.glob("*.json.gz"):
+        f.unlink()
+    assert cache.get("payload:b") == {"image": "b"}
+    assert cache.get("payload:a") is None
+
+
+def test_metadata_evicts_once_over_limit(tmp_path, monkeypatch):
+    cache = MetadataCache(path=tmp_path, max_entries=10)
+    evict = Mock(wraps=cache.evict)
+    monkeypatch.setattr(cache, "evict", evict)
+    for i in range(10):
+        cache.put(f"payload:{i}", {"image": i})
+        os.utime(cache._file(f"payload:{i}"), (i, i))
+    cache.put("payload:9", {"image": 9})
+    evict.assert_not_called()
+
+    cache.put("payload:10", {"image": 10})
+    evict.assert_called_once()
+    # The least recently used go, and leave room for a few more
+    assert cache.stats()["entries"] == 9
+    assert cache.get("payload:1") is None
+    assert cache.get("payload:2") == {"image": 2}
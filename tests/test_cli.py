@@ -1,7 +1,20 @@
+import asyncio
+import gc
+import json
+from unittest.mock import AsyncMock, patch
+
 import pytest
 from click.testing import CliRunner
 
 from oc_images.cli import images
+from oc_images.image import inspections
+from oc_images.imagecollection import namespace_index
+from oc_images.registry import RegistryError, registry_client
+
+# Recorded from the fake oc in benchmarks/, with two synthetic payloads
+CASSETTE = "tests/cassettes/diff.json"
+FIRST = "quay.io/openshift-release-dev/ocp-release:4.99.10-x86_64"
+SECOND = "quay.io/openshift-release-dev/ocp-release:4.99.11-x86_64"
 
 
 @pytest.mark.functional
@@ -194,3 +207,97 @@ class TestCliDiff:
         assert "Enlisting difference NVRs" in result.output
         assert "Only in ocp/4.18-art-assembly-4.18.3" in result.output
         assert "azure-service-operator" in result.output
+
+
+class TestCliReplay:
+    @pytest.fixture(autouse=True)
+    def loop(self):
+        # The commands run on the current event loop, which asyncio tests unset
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        yield loop
+        asyncio.set_event_loop(None)
+        loop.close()
+
+    def invoke(self, *args):
+        runner = CliRunner()
+        return runner.invoke(
+            images,
+            ["--no-cache", "--replay", CASSETTE, "--replay-scale", "0", *args],
+        )
+
+    def test_payload_diff(self):
+        result = self.invoke("diff", FIRST, SECOND)
+        assert result.exit_code == 0
+        assert "Only in" in result.output
+        assert "agent-installer-api-server-new" in result.output
+        assert (
+            "apiserver-network-proxy-container-v4.99.0-03e116309294.p0.assembly.stream.el9"
+            in result.output
+        )
+
+    def test_payload_diff_ndjson(self):
+        result = self.invoke("diff", "--output", "ndjson", FIRST, SECOND)
+        assert result.exit_code == 0
+        records = [json.loads(line) for line in result.output.splitlines()]
+        assert {(r["name"], r["change"]) for r in records} == {
+            ("apiserver-network-proxy", "changed"),
+            ("agent-installer-api-server", "removed"),
+            ("agent-installer-api-server-new", "added"),
+        }
+
+    def invoke_registry(self, *args):
+        """Invoke with --backend registry, where every registry lookup fails"""
+        image_info = AsyncMock(side_effect=RegistryError("unauthorized"))
+        with (
+            patch.object(registry_client, "image_info", image_info),
+            patch.object(registry_client, "fallbacks", 0),
+            patch("oc_images.image.registry_client", None),
+        ):
+            return self.invoke("--backend", "registry", *args), image_info
+
+    def test_registry_fallbacks_in_stats(self):
+        result, image_info = self.invoke_registry(
+            "--insecure-registry", "quay.io", "--stats", "diff", FIRST, SECOND
+        )
+        assert result.exit_code == 0
+        assert registry_client.insecure == {"quay.io"}
+        assert f"registry fallbacks: {image_info.await_count}" in result.stderr
+        assert image_info.await_count
+
+    def test_commands_do_not_share_state(self, loop):
+        stale = loop.create_future()
+        stale.set_result({})
+        inspections.start("sha256:stale", lambda: stale)
+        namespace_index.add("stale")
+        assert self.invoke("--prefetch", "ocp", "diff", FIRST, SECOND).exit_code == 0
+        assert "sha256:stale" not in inspections._calls
+        assert namespace_index.namespaces == {"ocp"}
+        namespace_index.clear()
+
+    @pytest.mark.parametrize("keep_open", [True, False])
+    def test_serve_keeps_registry_connections(self, keep_open):
+        with (
+            patch.object(registry_client, "keep_open", keep_open),
+            patch.object(registry_client, "close") as close,
+        ):
+            result, _ = self.invoke_registry("diff", FIRST, SECOND)
+        assert result.exit_code == 0
+        assert close.call_count == (not keep_open)
+
+    def test_not_recorded(self):
+        result = self.invoke("list", "4.18.3")
+        assert result.exit_code != 0
+        assert "is not in tests/cassettes/diff.json" in str(result.exception)
+
+    def test_record_and_replay_exclusive(self, tmp_path):
+        result = self.invoke("--record", str(tmp_path / "x.json"), "list", "4.18.3")
+        assert result.exit_code == 2
+
+    def test_failed_diff_leaves_no_task_errors(self, loop):
+        errors = []
+        loop.set_exception_handler(lambda loop, context: errors.append(context))
+        assert self.invoke("diff", FIRST, "4.18.3").exit_code != 0
+        # Tasks report errors nobody retrieved once they are collected
+        gc.collect()
+        assert errors == []
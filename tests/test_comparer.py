@@ -0,0 +1,196 @@
+import asyncio
+import copy
+import json
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+pytest_plugins = ("pytest_asyncio",)
+
+from oc_images.comparer import Comparer, MatrixComparer
+from oc_images.image import speculations
+from oc_images.util import Priority, Scheduler, current_claim
+
+FIRST = "quay.io/openshift-release-dev/ocp-release:4.20.0-ec.0-x86_64"
+SECOND = "quay.io/openshift-release-dev/ocp-release:4.20.0-ec.1-x86_64"
+
+
+@pytest.fixture
+def payload_info():
+    with open("tests/payload_data.json") as d:
+        return json.loads(d.read())
+
+
+def change_entry(payload_info, name, commit):
+    changed = copy.deepcopy(payload_info)
+    for entry in changed["references"]["spec"]["tags"]:
+        if entry["name"] == name:
+            entry["from"]["name"] = entry["from"]["name"][:-8] + "deadbeef"
+            entry["annotations"]["io.openshift.build.commit.id"] = commit
+    return changed
+
+
+@pytest.fixture
+def comparer(payload_info):
+    def make(**kwargs):
+        comparer = Comparer(FIRST, SECOND, **kwargs)
+        comparer.first._payload_info = payload_info
+        comparer.second._payload_info = change_entry(payload_info, "ironic", "abc")
+        return comparer
+
+    return make
+
+
+@pytest.mark.asyncio
+async def test_fast_diff_without_inspection(comparer):
+    comparer = comparer(fast=True)
+    run = AsyncMock()
+    with patch("oc_images.image.run", run):
+        await comparer.gen_name_diff()
+        await comparer.gen_payload_diff()
+    run.assert_not_awaited()
+    assert len(comparer.nvrdiff) == 1
+    assert comparer.nvrdiff[0]["name"] == "ironic"
+    assert comparer.nvrdiff[0]["second"] == "abc"
+
+
+@pytest.mark.asyncio
+async def test_fast_diff_marks_rebuilds(comparer, payload_info):
+    comparer = comparer(fast=True)
+    (cli,) = [
+        entry
+        for entry in payload_info["references"]["spec"]["tags"]
+        if entry["name"] == "cli"
+    ]
+    commit = cli["annotations"]["io.openshift.build.commit.id"]
+    comparer.second._payload_info = change_entry(
+        comparer.second._payload_info, "cli", commit
+    )
+    await comparer.gen_name_diff()
+    assert await comparer.changed_names() == ["cli", "ironic"]
+    await comparer.gen_payload_diff()
+    assert [(e["name"], e["rebuilt"]) for e in comparer.nvrdiff] == [
+        ("cli", True),
+        ("ironic", False),
+    ]
+    records = [r async for r in comparer.records()]
+    assert {r["name"] for r in records} == {"cli", "ironic"}
+
+
+def mirror(payload_info):
+    mirrored = copy.deepcopy(payload_info)
+    for entry in mirrored["references"]["spec"]["tags"]:
+        entry["from"]["name"] = entry["from"]["name"].replace(
+            "quay.io/openshift-release-dev/ocp-v4.0-art-dev",
+            "registry.ci.openshift.org/ocp/4.20-art-assembly-4.20.0-ec.0",
+        )
+    return mirrored
+
+
+@pytest.mark.asyncio
+async def test_mirrored_digests_are_identical(comparer, payload_info):
+    comparer = comparer()
+    comparer.second._payload_info = mirror(payload_info)
+    run = AsyncMock()
+    with patch("oc_images.image.run", run):
+        await comparer.gen_name_diff()
+        await comparer.gen_payload_diff()
+    run.assert_not_awaited()
+    assert comparer.nvrdiff == []
+
+
+@pytest.mark.asyncio
+async def test_manifest_list_matches_arch_manifest(comparer, image_cache):
+    comparer = comparer()
+    info = {
+        "digest": "sha256:arch",
+        "listDigest": "",
+        "config": {"config": {"Labels": {"version": "v4.20.0", "release": "1"}}},
+    }
+    run = AsyncMock(return_value=info)
+    with patch("oc_images.image.run", run):
+        await comparer.gen_name_diff()
+        await comparer.gen_payload_diff()
+    assert run.await_count == 2
+    assert comparer.nvrdiff == []
+
+
+@pytest.mark.asyncio
+async def test_inspects_while_other_collection_loads(comparer, image_cache):
+    comparer = comparer()
+    second_images = await comparer.second.images()
+    scheduler = Scheduler(jobs=2)
+
+    async def slow_images():
+        await asyncio.sleep(0.05)
+        return second_images
+
+    inspected = []
+
+    async def image_info(cmd):
+        async with scheduler.slot(Priority.INSPECT, current_claim.get()):
+            await asyncio.sleep(0.01)
+        inspected.append(cmd[-1])
+        labels = {"version": "v4.20.0", "release": cmd[-1][-8:]}
+        return {"digest": "", "config": {"config": {"Labels": labels}}}
+
+    comparer.second.images = slow_images
+    with (
+        patch("oc_images.image.run", AsyncMock(side_effect=image_info)),
+        patch("oc_images.util.scheduler", scheduler),
+    ):
+        await comparer.gen_name_diff()
+        # The first payload was inspected while the second one loaded
+        assert len(inspected) > 2
+        await comparer.gen_payload_diff()
+        await asyncio.sleep(0.02)
+    # And images that did not change were abandoned once it arrived
+    assert len(inspected) < len(second_images) / 2
+    assert not speculations
+    assert [entry["name"] for entry in comparer.nvrdiff] == ["ironic"]
+
+
+@pytest.mark.asyncio
+async def test_matrix_inspects_distinct_digests_once(payload_info, image_cache):
+    third = "quay.io/openshift-release-dev/ocp-release:4.20.0-ec.2-x86_64"
+    comparer = MatrixComparer([FIRST, SECOND, third])
+    changed = change_entry(payload_info, "ironic", "abc")
+    comparer.collections[0]._payload_info = payload_info
+    comparer.collections[1]._payload_info = changed
+    comparer.collections[2]._payload_info = mirror(changed)
+
+    async def image_info(cmd):
+        digest = cmd[-1].split("@")[1]
+        labels = {"version": "v4.20.0", "release": digest[-8:]}
+        return {"digest": digest, "config": {"config": {"Labels": labels}}}
+
+    run = AsyncMock(side_effect=image_info)
+    with patch("oc_images.image.run", run):
+        await comparer.gen_matrix()
+    assert run.await_count == 2
+    assert list(comparer.matrix) == ["ironic"]
+    first, second, third = comparer.matrix["ironic"]
+    assert first != second == third
+
+
+@pytest.mark.asyncio
+async def test_records(comparer, payload_info):
+    comparer = comparer(fast=True)
+    second = change_entry(payload_info, "ironic", "abc")
+    second["references"]["spec"]["tags"] = [
+        entry
+        for entry in second["references"]["spec"]["tags"]
+        if entry["name"] != "cli"
+    ]
+    comparer.second._payload_info = second
+    run = AsyncMock()
+    with patch("oc_images.image.run", run):
+        records = {r["name"]: r async for r in comparer.records()}
+    run.assert_not_awaited()
+    assert records.keys() == {"ironic", "cli"}
+    assert records["ironic"]["change"] == "changed"
+    assert records["ironic"]["second"]["commit"] == "abc"
+    assert records["ironic"]["first"]["digest"] != records["ironic"]["second"]["digest"]
+    assert records["cli"]["change"] == "removed"
+    assert records["cli"]["second"] is None
+    assert records["cli"]["first"]["repo"] == "https://github.com/openshift/oc"
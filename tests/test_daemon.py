@@ -0,0 +1,111 @@
+import io
+import json
+import os
+import socket
+
+import click
+import pytest
+
+from oc_images.cli import images
+from oc_images.client import GROUP_OPTIONS_WITH_VALUE, command_of, connect
+from oc_images.client import request as relay
+from oc_images.daemon import Daemon
+
+
+@click.group()
+def fake():
+    pass
+
+
+@fake.command()
+@click.argument("word")
+def echo(word):
+    print(word)
+    click.echo("to stderr", err=True)
+
+
+@fake.command()
+def fail():
+    raise RuntimeError("boom")
+
+
+def request(daemon, argv, tmp_path):
+    rfile = io.BytesIO(json.dumps({"argv": argv, "cwd": str(tmp_path)}).encode())
+    wfile = io.BytesIO()
+    daemon.handle(rfile, wfile)
+    return [json.loads(line) for line in wfile.getvalue().splitlines()]
+
+
+@pytest.mark.parametrize(
+    ("argv", "command"),
+    [
+        (["list", "4.18.3"], "list"),
+        (["--jobs", "8", "--no-cache", "diff", "a", "b"], "diff"),
+        (["-j", "8", "--trace", "list.json", "list", "x"], "list"),
+        (["--help"], ""),
+    ],
+)
+def test_command_of(argv, command):
+    assert command_of(argv) == command
+
+
+def test_group_options_with_value_are_known():
+    options = {
+        opt
+        for param in images.params
+        if isinstance(param, click.Option) and not param.is_flag
+        for opt in param.opts
+    }
+    assert options == set(GROUP_OPTIONS_WITH_VALUE)
+
+
+def test_daemon_relays_output(tmp_path):
+    messages = request(Daemon(fake, ""), ["echo", "hello"], tmp_path)
+    stdout = "".join(m["data"] for m in messages if m.get("stream") == "stdout")
+    stderr = "".join(m["data"] for m in messages if m.get("stream") == "stderr")
+    assert (stdout, stderr) == ("hello\n", "to stderr\n")
+    assert messages[-1] == {"exit": 0}
+
+
+@pytest.mark.parametrize(("argv", "code"), [(["fail"], 1), (["nonsense"], 2)])
+def test_daemon_reports_errors(tmp_path, argv, code):
+    daemon = Daemon(fake, "")
+    assert request(daemon, argv, tmp_path)[-1] == {"exit": code}
+    # And keeps serving
+    assert request(daemon, ["echo", "again"], tmp_path)[-1] == {"exit": 0}
+
+
+def test_connect_only_to_own_socket(tmp_path, monkeypatch):
+    path = str(tmp_path / "oc-images.sock")
+    assert connect(path) is None
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
+        server.bind(path)
+        server.listen()
+        with connect(path):
+            pass
+        # Someone else's socket
+        uid = os.getuid()
+        monkeypatch.setattr(os, "getuid", lambda: uid + 1)
+        assert connect(path) is None
+        monkeypatch.setattr(os, "getuid", lambda: uid)
+        # In a directory others can write to
+        os.chmod(tmp_path, 0o777)
+        assert connect(path) is None
+    os.unlink(path)
+    (tmp_path / "oc-images.sock").write_text("not a socket")
+    assert connect(path) is None
+
+
+def test_client_exits_quietly_when_reader_goes_away(monkeypatch):
+    client, server = socket.socketpair()
+    read_fd, write_fd = os.pipe()
+    os.close(read_fd)
+    stdout = os.fdopen(write_fd, "w")
+    monkeypatch.setattr("sys.stdout", stdout)
+    with server:
+        for message in ({"stream": "stdout", "data": "a\n"}, {"exit": 0}):
+            server.sendall((json.dumps(message) + "\n").encode())
+        assert relay(client, ["diff", "a", "b"]) == 1
+    # What is left in the buffer is gone too
+    stdout.write("b\n")
+    stdout.close()
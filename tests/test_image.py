@@ -0,0 +1,133 @@
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+pytest_plugins = ("pytest_asyncio",)
+
+from oc_images.image import Image
+from oc_images.registry import RegistryClient, RegistryError
+
+PULLSPEC = "quay.io/openshift-release-dev/ocp-v4.0-art-dev@sha256:4e672082ec967a9de7d149cf5cd7cbd4036425806d75ec6762b974bb3ae26d6d"
+
+OC_IMAGE_INFO = {
+    "config": {
+        "config": {
+            "Labels": {
+                "com.redhat.component": "ose-installer-container",
+                "version": "v4.18.0",
+                "release": "202502260503.p0.g8303123.assembly.stream.el9",
+                "io.openshift.build.commit.id": "8303123",
+                "io.openshift.build.source-location": "https://github.com/openshift/installer",
+            }
+        }
+    }
+}
+
+
+def test_digest():
+    assert Image(pullspec=PULLSPEC).digest.startswith("sha256:4e672082")
+    assert Image(pullspec="quay.io/foo/bar:latest").digest == ""
+
+
+@pytest.mark.asyncio
+async def test_obtain_info_uses_cache(image_cache, inspections):
+    run = AsyncMock(return_value=OC_IMAGE_INFO)
+    with patch("oc_images.image.run", run):
+        first = await Image(name="installer", pullspec=PULLSPEC).nvr()
+        inspections.clear()
+        second = await Image(name="installer", pullspec=PULLSPEC).nvr()
+    assert first == second
+    assert (
+        first
+        == "ose-installer-container-v4.18.0-202502260503.p0.g8303123.assembly.stream.el9"
+    )
+    run.assert_awaited_once()
+    assert image_cache.hits == 1
+
+
+@pytest.mark.asyncio
+async def test_obtain_info_without_digest_not_cached(image_cache):
+    run = AsyncMock(return_value=OC_IMAGE_INFO)
+    with patch("oc_images.image.run", run):
+        await Image(pullspec="quay.io/foo/bar:latest").nvr()
+    assert image_cache.entries == {}
+
+
+@pytest.mark.asyncio
+async def test_concurrent_inspections_coalesce(image_cache):
+    async def slow_run(cmd):
+        await asyncio.sleep(0.01)
+        return OC_IMAGE_INFO
+
+    run = AsyncMock(side_effect=slow_run)
+    image = Image(name="installer", pullspec=PULLSPEC)
+    mirrored = Image(
+        name="installer",
+        pullspec=PULLSPEC.replace(
+            "quay.io/openshift-release-dev/ocp-v4.0-art-dev",
+            "registry.ci.openshift.org/ocp/4.18-art-assembly-4.18.3",
+        ),
+    )
+    with patch("oc_images.image.run", run):
+        result = await asyncio.gather(
+            image.nvr(), image.commit(), mirrored.nvr(), mirrored.version()
+        )
+    run.assert_awaited_once()
+    assert result[0] == result[2]
+    assert result[1] == "8303123"
+
+
+@pytest.mark.asyncio
+async def test_failed_inspection_is_retried(image_cache):
+    run = AsyncMock(side_effect=[RuntimeError("registry down"), OC_IMAGE_INFO])
+    with patch("oc_images.image.run", run):
+        with pytest.raises(RuntimeError):
+            await Image(pullspec=PULLSPEC).nvr()
+        assert await Image(pullspec=PULLSPEC).nvr()
+    assert run.await_count == 2
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "error",
+    [
+        RegistryError("unauthorized"),
+        asyncio.IncompleteReadError(b"", 10),
+        TimeoutError(),
+    ],
+)
+async def test_registry_backend_falls_back_to_oc(image_cache, error):
+    client = RegistryClient()
+    client.image_info = AsyncMock(side_effect=error)
+    run = AsyncMock(return_value=OC_IMAGE_INFO)
+    with (
+        patch("oc_images.image.registry_client", client),
+        patch("oc_images.image.run", run),
+    ):
+        assert await Image(pullspec=PULLSPEC).commit() == "8303123"
+    client.image_info.assert_awaited_once()
+    run.assert_awaited_once()
+    assert client.fallbacks == 1
+
+
+@pytest.mark.asyncio
+async def test_falsy_fields_are_not_reinspected(image_cache):
+    info = {"config": {"config": {"Labels": {"version": "v4.18.0", "release": ""}}}}
+    run = AsyncMock(return_value=info)
+    image = Image(pullspec=PULLSPEC)
+    with patch("oc_images.image.run", run):
+        assert await image.release_operator() is False
+        assert await image.release() == ""
+        assert await image.release_operator() is False
+    run.assert_awaited_once()
+
+
+def test_resolution_state():
+    image = Image(pullspec=PULLSPEC, commit="8303123")
+    assert image.resolved(["commit"])
+    assert not image.resolved(["commit", "repo"])
+    assert not image.resolved()
+    with pytest.raises(ValueError):
+        image.resolved(["colour"])
+    assert not hasattr(image, "__dict__")
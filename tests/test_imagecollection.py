@@ -1,15 +1,18 @@
 import json
 from unittest import mock
-from unittest.mock import MagicMock, Mock, patch
+from unittest.mock import AsyncMock, MagicMock, Mock, patch
 
 import pytest
 
 pytest_plugins = ("pytest_asyncio",)
 
+from oc_images.cache import MetadataCache
 from oc_images.image import Image
 from oc_images.imagecollection import (
     CollectionType,
     ImageCollection,
+    NamespaceIndex,
+    compact_payload_info,
 )
 
 istream = CollectionType.IMAGESTREAM
@@ -74,6 +77,26 @@ async def test_get_payload_images(payload_image):
     assert images["oc-mirror"].commit
 
 
+@pytest.mark.asyncio
+async def test_payload_tags_dropped_once_loaded(payload_image):
+    compact = compact_payload_info(payload_image._payload_info)
+    ironic = next(
+        t for t in compact["references"]["spec"]["tags"] if t["name"] == "ironic"
+    )
+    assert ironic["annotations"].keys() == {
+        "io.openshift.build.commit.id",
+        "io.openshift.build.source-location",
+    }
+    # Applying it again changes nothing
+    assert compact_payload_info(compact) == compact
+
+    payload_image._payload_info = compact
+    images = await payload_image.images()
+    assert "references" not in await payload_image.payload_info()
+    assert await payload_image.name() == payload_image.pointer
+    assert images["ironic"].pullspec is ironic["from"]["name"]
+
+
 @pytest.mark.parametrize(
     ("collection", "isname"),
     [
@@ -99,3 +122,169 @@ def test_is_coordinates(collection, isname):
     ic = ImageCollection(collection)
     coordinates = ic.is_coordinates
     assert isname == f"{coordinates['namespace']}/{coordinates['name']}"
+
+
+@pytest.mark.parametrize(
+    ("pointer", "arch", "expected"),
+    [
+        ("4.18.3", "x86_64", "ocp/4.18-art-assembly-4.18.3"),
+        ("4.18.3", "s390x", "ocp-s390x/4.18-art-assembly-4.18.3-s390x"),
+        ("4.19-art-latest-s390x", "arm64", "ocp-arm64/4.19-art-latest-arm64"),
+        ("4.19-art-latest-s390x", "x86_64", "ocp/4.19-art-latest"),
+        (
+            "quay.io/openshift-release-dev/ocp-release:4.18.3-x86_64",
+            "arm64",
+            "quay.io/openshift-release-dev/ocp-release:4.18.3-aarch64",
+        ),
+    ],
+)
+def test_arch_pointer(pointer, arch, expected):
+    assert ImageCollection(pointer).arch_pointer(arch) == expected
+
+
+def test_arch_pointer_unknown():
+    with pytest.raises(ValueError):
+        ImageCollection(
+            "registry.ci.openshift.org/ocp/release:4.20.0-0.nightly-2025-06-06-044542"
+        ).arch_pointer("s390x")
+
+
+@pytest.fixture
+def metadata_cache(tmp_path):
+    cache = MetadataCache(path=tmp_path)
+    with patch("oc_images.imagecollection.metadata_cache", cache):
+        yield cache
+
+
+@pytest.mark.parametrize(
+    ("pointer", "immutable"),
+    [
+        ("quay.io/openshift-release-dev/ocp-release:4.18.3-x86_64", True),
+        ("quay.io/openshift-release-dev/ocp-release:4.19.0-rc.5-s390x", True),
+        ("quay.io/openshift-release-dev/ocp-release@sha256:b5bea75663", True),
+        (
+            "registry.ci.openshift.org/ocp/release:4.20.0-0.nightly-2025-06-06-044542",
+            False,
+        ),
+        ("4.19-art-latest", False),
+    ],
+)
+def test_immutable(pointer, immutable):
+    assert ImageCollection(pointer).immutable == immutable
+
+
+@pytest.mark.asyncio
+async def test_payload_info_cached(metadata_cache):
+    with open("tests/payload_data.json") as d:
+        data = json.loads(d.read())
+    pointer = "quay.io/openshift-release-dev/ocp-release:4.20.0-ec.0-x86_64"
+    run = AsyncMock(return_value=data)
+    with patch("oc_images.imagecollection.run", run):
+        await ImageCollection(pointer).payload_info()
+        assert await ImageCollection(pointer).payload_info() == compact_payload_info(
+            data
+        )
+    run.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_is_info_freshness(metadata_cache):
+    def imagestream(version):
+        return {"metadata": {"resourceVersion": version}, "status": {"tags": []}}
+
+    run = AsyncMock(
+        side_effect=[
+            imagestream("1"),
+            imagestream("1")["metadata"],
+            imagestream("2")["metadata"],
+            imagestream("2"),
+        ]
+    )
+    with patch("oc_images.imagecollection.run", run):
+        assert (await ImageCollection("4.19-art-latest").is_info()) == imagestream("1")
+        assert (await ImageCollection("4.19-art-latest").is_info()) == imagestream("1")
+        assert (await ImageCollection("4.19-art-latest").is_info()) == imagestream("2")
+    assert [c.args[0][-1] for c in run.await_args_list] == [
+        "json",
+        "jsonpath={.metadata}",
+        "jsonpath={.metadata}",
+        "json",
+    ]
+    assert metadata_cache.hits == 1
+
+
+@pytest.mark.asyncio
+async def test_tags_without_items_are_skipped(metadata_cache):
+    pullspec = "quay.io/openshift-release-dev/ocp-v4.0-art-dev@sha256:aaa"
+    data = {
+        "metadata": {
+            "namespace": "ocp",
+            "name": "4.20-art-latest",
+            "resourceVersion": "1",
+        },
+        "status": {
+            "tags": [
+                {"tag": "cli", "items": [{"dockerImageReference": pullspec}]},
+                {"tag": "broken", "items": None, "conditions": [{"status": "False"}]},
+            ]
+        },
+    }
+    with patch("oc_images.imagecollection.run", AsyncMock(return_value=data)):
+        images = await ImageCollection("4.20-art-latest").images()
+    assert list(images) == ["cli"]
+
+
+@pytest.mark.asyncio
+async def test_namespace_index(metadata_cache):
+    def imagestream(name):
+        return {
+            "metadata": {"namespace": "ocp", "name": name, "resourceVersion": "1"},
+            "status": {"tags": []},
+        }
+
+    names = ["4.18-art-assembly-4.18.1", "4.18-art-assembly-4.18.2", "4.18-art-latest"]
+    run = AsyncMock(
+        side_effect=[
+            {"kind": "List", "items": [imagestream(name) for name in names]},
+            imagestream("4.18-art-latest")["metadata"],
+        ]
+    )
+    index = NamespaceIndex()
+    collections = [ImageCollection(p) for p in ["4.18.1", "4.18.2", "4.18-art-latest"]]
+    index.add_for(collections)
+    with (
+        patch("oc_images.imagecollection.run", run),
+        patch("oc_images.imagecollection.namespace_index", index),
+    ):
+        infos = [await c.is_info() for c in collections]
+        # Handed out once, the next lookup checks the cache by itself
+        assert await ImageCollection("4.18-art-latest").is_info() == infos[2]
+    assert [i["metadata"]["name"] for i in infos] == names
+    assert [c.args[0] for c in run.await_args_list] == [
+        ["oc", "--namespace", "ocp", "get", "is", "--output", "json"],
+        ["oc", "--namespace", "ocp", "get", "is", "4.18-art-latest"]
+        + ["--output", "jsonpath={.metadata}"],
+    ]
+
+
+@pytest.mark.asyncio
+async def test_namespace_index_threshold():
+    index = NamespaceIndex()
+    index.add_for([ImageCollection("4.18.1"), ImageCollection("4.18.2")])
+    assert index.namespaces == set()
+
+
+@pytest.mark.asyncio
+async def test_resolve(payload_image, image_cache):
+    info = {"config": {"config": {"Labels": {"version": "v4.20.0", "release": "1"}}}}
+    run = AsyncMock(return_value=info)
+    with patch("oc_images.image.run", run):
+        images = await payload_image.images()
+        unannotated = [i for i in images.values() if not i.resolved(["commit", "repo"])]
+        await payload_image.resolve(fields=["commit", "repo"])
+        assert run.await_count == len(unannotated) < len(images)
+        await payload_image.resolve(fields=["nvr"])
+        assert run.await_count == len(images)
+        await payload_image.resolve()
+        assert run.await_count == len(images)
+    assert all(image.resolved() for image in images.values())
@@ -0,0 +1,94 @@
+import json
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+pytest_plugins = ("pytest_asyncio",)
+
+from oc_images.cli import query
+from oc_images.imagecollection import ImageCollection
+from oc_images.index import COLUMNS, ReleaseIndex, guess_kind
+
+
+async def fake_image_info(cmd):
+    digest = cmd[-1].split("@")[1]
+    labels = {
+        "com.redhat.component": "container",
+        "version": "v4.20.0",
+        "release": digest[-8:],
+        "io.openshift.build.commit.id": digest[7:47],
+        "io.openshift.build.source-location": "https://github.com/openshift/foo",
+    }
+    return {"digest": digest, "config": {"config": {"Labels": labels}}}
+
+
+def payload(version: str):
+    ic = ImageCollection(f"quay.io/openshift-release-dev/ocp-release:{version}-x86_64")
+    with open("tests/payload_data.json") as d:
+        ic._payload_info = json.loads(d.read())
+    ic._payload_info["image"] = ic.pointer
+    ic._payload_info["digest"] = f"sha256:{version}"
+    return ic
+
+
+@pytest.fixture
+def run(image_cache):
+    run = AsyncMock(side_effect=fake_image_info)
+    with patch("oc_images.image.run", run):
+        yield run
+
+
+@pytest.mark.parametrize(
+    ("value", "kind"),
+    [
+        ("sha256:4e672082", "digest"),
+        ("8303123", "commit"),
+        ("https://github.com/openshift/installer", "repo"),
+        ("ose-installer-container-v4.18.0", "nvr"),
+    ],
+)
+def test_guess_kind(value, kind):
+    assert guess_kind(value) == kind
+
+
+@pytest.mark.asyncio
+async def test_index_and_query(tmp_path, run):
+    index = ReleaseIndex(tmp_path / "index.sqlite")
+    assert await index.add(payload("4.20.0"))
+    assert await index.add(payload("4.20.1"))
+    inspections = run.await_count
+
+    # Unchanged collections are not resolved again
+    assert not await index.add(payload("4.20.0"))
+    assert run.await_count == inspections
+
+    images = await payload("4.20.0").resolve()
+    ironic = images["ironic"]
+    by_commit = list(index.query((await ironic.commit())[:10]))
+    assert [row[:2] for row in by_commit] == [
+        ("quay.io/openshift-release-dev/ocp-release:4.20.0-x86_64", "ironic"),
+        ("quay.io/openshift-release-dev/ocp-release:4.20.1-x86_64", "ironic"),
+    ]
+    assert len(list(index.query(ironic.digest, collection="4.20.1"))) == 1
+    assert len(list(index.query(await ironic.nvr(), kind="nvr"))) == 2
+    assert list(index.query("no-such-container")) == []
+    # Only commits match as a prefix
+    assert list(index.query((await ironic.nvr())[:20], kind="nvr")) == []
+    assert list(index.query(ironic.digest[:20])) == []
+    assert index.stats()["collections"] == 2
+
+
+def test_stats_and_clear_leave_no_index_behind(tmp_path):
+    index = ReleaseIndex(tmp_path / "index.sqlite")
+    assert index.stats()["status"] == "absent"
+    assert not index.path.exists()
+    assert index.indexed_version("4.20.0") is False
+    assert index.stats()["collections"] == 0
+    index.clear()
+    assert not index.path.exists()
+    assert index.stats()["status"] == "absent"
+
+
+def test_query_choices_are_columns():
+    (by,) = [param for param in query.params if param.name == "by"]
+    assert list(by.type.choices) == ["auto", *COLUMNS]
@@ -0,0 +1,158 @@
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest_plugins = ("pytest_asyncio",)
+
+from oc_images.registry import RegistryClient, RegistryError, parse_pullspec
+from oc_images.util import policy
+
+LABELS = {
+    "com.redhat.component": "ironic-container",
+    "version": "v4.20.0",
+    "release": "202504141045.p0.g9de7792.assembly.stream.el9",
+}
+
+
+def digest(body: bytes):
+    return f"sha256:{hashlib.sha256(body).hexdigest()}"
+
+
+CONFIG = json.dumps({"config": {"Labels": LABELS}}).encode()
+MANIFEST = json.dumps(
+    {
+        "mediaType": "application/vnd.docker.distribution.manifest.v2+json",
+        "config": {"digest": digest(CONFIG)},
+    }
+).encode()
+MANIFEST_LIST = json.dumps(
+    {
+        "mediaType": "application/vnd.docker.distribution.manifest.list.v2+json",
+        "manifests": [
+            {
+                "digest": "sha256:s390x",
+                "platform": {"os": "linux", "architecture": "s390x"},
+            },
+            {
+                "digest": digest(MANIFEST),
+                "platform": {"os": "linux", "architecture": "amd64"},
+            },
+        ],
+    }
+).encode()
+
+
+class FakeRegistry(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    requests = []
+    connections = set()
+
+    def log_message(self, *args):
+        pass
+
+    def reply(self, status, body=b"", headers=None):
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        FakeRegistry.requests.append(self.path)
+        FakeRegistry.connections.add(self.client_address)
+        host = self.headers["Host"]
+        if self.path.startswith("/token"):
+            return self.reply(200, json.dumps({"token": "secret"}).encode())
+        if self.path.startswith("/storage/"):
+            return self.reply(200, CONFIG)
+        if self.headers.get("Authorization") != "Bearer secret":
+            challenge = f'Bearer realm="http://{host}/token",service="fake"'
+            return self.reply(401, headers={"WWW-Authenticate": challenge})
+
+        if self.path.endswith("/stalled"):
+            time.sleep(1)
+        manifests = {
+            "/v2/ocp/release/manifests/list": MANIFEST_LIST,
+            f"/v2/ocp/release/manifests/{digest(MANIFEST)}": MANIFEST,
+        }
+        if self.path in manifests:
+            body = manifests[self.path]
+            return self.reply(200, body, {"Docker-Content-Digest": digest(body)})
+        if self.path == f"/v2/ocp/release/blobs/{digest(CONFIG)}":
+            return self.reply(307, headers={"Location": "/storage/config"})
+        self.reply(404)
+
+
+@pytest.fixture
+def registry():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeRegistry)
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    FakeRegistry.requests = []
+    FakeRegistry.connections = set()
+    yield f"127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+@pytest.mark.parametrize(
+    ("pullspec", "expected"),
+    [
+        (
+            "quay.io/openshift-release-dev/ocp-v4.0-art-dev@sha256:abc",
+            ("quay.io", "openshift-release-dev/ocp-v4.0-art-dev", "sha256:abc"),
+        ),
+        (
+            "registry.ci.openshift.org/ocp/release:4.20.0-0.nightly",
+            ("registry.ci.openshift.org", "ocp/release", "4.20.0-0.nightly"),
+        ),
+        ("localhost:5000/foo", ("localhost:5000", "foo", "latest")),
+        ("busybox", ("registry-1.docker.io", "library/busybox", "latest")),
+    ],
+)
+def test_parse_pullspec(pullspec, expected):
+    assert parse_pullspec(pullspec) == expected
+
+
+@pytest.mark.asyncio
+async def test_image_info_from_manifest_list(registry):
+    client = RegistryClient(insecure=[registry])
+    info = await client.image_info(f"{registry}/ocp/release:list")
+    assert info["config"]["config"]["Labels"] == LABELS
+    assert info["listDigest"] == digest(MANIFEST_LIST)
+    assert info["digest"] == digest(MANIFEST)
+    client.close()
+
+
+@pytest.mark.asyncio
+async def test_connections_are_reused(registry):
+    client = RegistryClient(insecure=[registry])
+    for _ in range(3):
+        info = await client.image_info(f"{registry}/ocp/release@{digest(MANIFEST)}")
+        assert info["config"]["config"]["Labels"] == LABELS
+    client.close()
+    assert FakeRegistry.requests.count("/token?service=fake") == 1
+    assert len(FakeRegistry.connections) == 1
+
+
+@pytest.mark.asyncio
+async def test_missing_platform(registry):
+    client = RegistryClient(platform="linux/ppc64le", insecure=[registry])
+    with pytest.raises(RegistryError):
+        await client.image_info(f"{registry}/ocp/release:list")
+    client.close()
+
+
+@pytest.mark.asyncio
+async def test_stalled_registry_times_out(registry, monkeypatch):
+    monkeypatch.setattr(policy, "timeout", 0.1)
+    client = RegistryClient(insecure=[registry])
+    with pytest.raises(TimeoutError):
+        await client.image_info(f"{registry}/ocp/release:stalled")
+    # The connection was in the middle of a response, so it is not reused
+    assert not any(client.pool._idle.values())
+    client.close()
@@ -0,0 +1,53 @@
+import json
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+pytest_plugins = ("pytest_asyncio",)
+
+from oc_images.imagecollection import CollectionType, ImageCollection
+from oc_images.snapshot import read_snapshot, write_snapshot
+
+
+async def fake_image_info(cmd):
+    digest = cmd[-1].split("@")[1]
+    labels = {
+        "com.redhat.component": "container",
+        "version": "v4.20.0",
+        "release": digest[-8:],
+    }
+    return {"digest": digest, "config": {"config": {"Labels": labels}}}
+
+
+@pytest.fixture
+def payload():
+    ic = ImageCollection("quay.io/openshift-release-dev/ocp-release:4.20.0-ec.0-x86_64")
+    with open("tests/payload_data.json") as d:
+        ic._payload_info = json.loads(d.read())
+    return ic
+
+
+@pytest.mark.parametrize("suffix", [".ndjson", ".ndjson.gz"])
+@pytest.mark.asyncio
+async def test_snapshot_roundtrip(payload, tmp_path, suffix, image_cache):
+    path = str(tmp_path / f"snapshot{suffix}")
+    run = AsyncMock(side_effect=fake_image_info)
+    with patch("oc_images.image.run", run):
+        assert await write_snapshot(payload, path) == 190
+        original = await payload.images()
+
+        snapshot = ImageCollection(path)
+        assert snapshot.type == CollectionType.SNAPSHOT
+        assert await snapshot.name() == await payload.name()
+        images = await snapshot.images()
+        assert images.keys() == original.keys()
+        assert await images["ironic"].nvr() == await original["ironic"].nvr()
+        assert images["ironic"].manifest_digest == original["ironic"].digest
+    assert run.await_count == 190
+
+
+def test_snapshot_version(tmp_path):
+    path = tmp_path / "snapshot.ndjson"
+    path.write_text('{"snapshot": 99}\n')
+    with pytest.raises(ValueError):
+        read_snapshot(path)
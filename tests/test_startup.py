@@ -0,0 +1,57 @@
+import subprocess
+import sys
+
+# Modules that importing the cli must not load, as only some commands need
+# them. Scripts call oc-images a lot, so what every invocation imports counts.
+# `make bench` times the startup itself.
+DEFERRED = (
+    "rich",
+    "markdown_it",
+    "sqlite3",
+    "socketserver",
+    "oc_images.daemon",
+    "oc_images.index",
+    "oc_images.registry",
+)
+
+# Ceiling on the cumulative import time of the cli, in microseconds, for the
+# best of a few runs. That is 0.1-0.13s without bytecode caches on a slow
+# machine, and importing rich up front alone adds about 0.15s.
+IMPORT_BUDGET_US = 200_000
+
+
+def run_python(*args):
+    return subprocess.run(
+        [sys.executable, *args], capture_output=True, check=True, text=True
+    )
+
+
+def test_import_defers_command_modules():
+    result = run_python("-X", "importtime", "-c", "import oc_images.cli")
+    imported = {line.split("|")[-1].strip() for line in result.stderr.splitlines()}
+    assert imported.isdisjoint(DEFERRED)
+
+
+def import_time(module: str) -> int:
+    result = run_python("-X", "importtime", "-c", f"import {module}")
+    (cumulative,) = (
+        int(line.split("|")[1])
+        for line in result.stderr.splitlines()
+        if line.split("|")[-1] == f" {module}"
+    )
+    return cumulative
+
+
+def test_import_within_budget():
+    assert min(import_time("oc_images.cli") for _ in range(3)) < IMPORT_BUDGET_US
+
+
+def test_cheap_paths_do_not_import_rich():
+    code = """
+import sys
+from oc_images.cli import images
+for args in (["--help"], ["list", "--help"], ["diff", "--help"]):
+    images(args, standalone_mode=False)
+print(sorted(m for m in sys.modules if m.split(".")[0] in ("rich", "markdown_it")))
+"""
+    assert run_python("-c", code).stdout.strip().splitlines()[-1] == "[]"
@@ -0,0 +1,61 @@
+import json
+
+import pytest
+
+from oc_images.trace import Span, Tracer, percentile
+
+
+@pytest.fixture
+def tracer():
+    tracer = Tracer()
+    tracer.origin = 0.0
+    tracer.spans = [
+        Span("oc adm release info", "subprocess", 0.0, 1.0),
+        Span("oc image info", "subprocess", 1.0, 1.5),
+        Span("oc image info", "subprocess", 1.1, 2.5),
+        Span("oc image info", "subprocess", 1.2, 1.4),
+        Span("render", "render", 2.5, 2.6),
+    ]
+    return tracer
+
+
+@pytest.mark.parametrize(("p", "expected"), [(0, 1), (50, 2), (95, 4), (100, 4)])
+def test_percentile(p, expected):
+    assert percentile([4, 1, 3, 2], p) == expected
+
+
+def test_concurrency(tracer):
+    average, peak = tracer.concurrency()
+    assert peak == 3
+    assert average == pytest.approx(3.1 / 2.5)
+
+
+def test_critical_path(tracer):
+    path = [(s.name, s.end) for s in tracer.critical_path()]
+    assert path == [
+        ("oc adm release info", 1.0),
+        ("oc image info", 2.5),
+        ("render", 2.6),
+    ]
+
+
+def test_summary(tracer):
+    summary = tracer.summary({"images": (3, 1)})
+    assert "3 peak oc processes" in summary
+    assert "Cache images: 3 hits, 1 misses" in summary
+    assert "oc image info" in summary
+
+
+def test_write_trace(tracer, tmp_path):
+    tracer.write_trace(tmp_path / "trace.json")
+    events = json.loads((tmp_path / "trace.json").read_text())["traceEvents"]
+    assert len(events) == 5
+    assert events[1]["ts"] == 1_000_000
+    assert len({e["tid"] for e in events}) == 3
+
+
+def test_disabled_records_nothing():
+    tracer = Tracer()
+    with tracer.span("oc image info", "subprocess"):
+        pass
+    assert tracer.spans == []
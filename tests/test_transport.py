@@ -0,0 +1,68 @@
+import asyncio
+import time
+
+import pytest
+
+pytest_plugins = ("pytest_asyncio",)
+
+from oc_images.transport import Transport
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("name", ["session.json", "session.json.gz"])
+async def test_record_and_replay(tmp_path, name):
+    path = tmp_path / name
+    recorder = Transport()
+    recorder.record(path)
+    ok = ["sh", "-c", "sleep 0.05; echo '{\"a\": 1}'"]
+    failing = ["sh", "-c", "echo 'error: 503' >&2; exit 1"]
+    assert await recorder.execute(ok) == (0, b'{"a": 1}\n', b"")
+    assert await recorder.execute(failing) == (1, b"", b"error: 503\n")
+    recorder.close()
+
+    replayer = Transport()
+    replayer.replay(path, scale=0)
+    assert await replayer.execute(ok) == (0, b'{"a": 1}\n', b"")
+    assert await replayer.execute(failing) == (1, b"", b"error: 503\n")
+    returncode, _, stderr = await replayer.execute(["oc", "version"])
+    assert returncode == 1
+    assert b"is not in" in stderr
+
+    # Recorded latency, scaled
+    replayer.replay(path, scale=2)
+    started = time.perf_counter()
+    await replayer.execute(ok)
+    assert time.perf_counter() - started >= 0.1
+
+
+@pytest.mark.asyncio
+async def test_replay_in_recorded_order(tmp_path):
+    path = tmp_path / "session.json"
+    recorder = Transport()
+    recorder.record(path)
+    counter = tmp_path / "counter"
+    cmd = ["sh", "-c", f"echo x >> {counter}; wc -l < {counter}"]
+    for _ in range(2):
+        await recorder.execute(cmd)
+    recorder.close()
+
+    replayer = Transport()
+    replayer.replay(path, scale=0)
+    replies = [(await replayer.execute(cmd))[1].strip() for _ in range(3)]
+    # The last reply keeps coming
+    assert replies == [b"1", b"2", b"2"]
+
+
+@pytest.mark.asyncio
+async def test_replay_is_cancellable(tmp_path):
+    path = tmp_path / "session.json"
+    recorder = Transport()
+    recorder.record(path)
+    await recorder.execute(["sh", "-c", "sleep 0.2; echo {}"])
+    recorder.close()
+
+    replayer = Transport()
+    replayer.replay(path)
+    with pytest.raises(TimeoutError):
+        async with asyncio.timeout(0.05):
+            await replayer.execute(["sh", "-c", "sleep 0.2; echo {}"])
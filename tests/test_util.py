@@ -0,0 +1,244 @@
+import asyncio
+from unittest.mock import patch
+
+import pytest
+
+pytest_plugins = ("pytest_asyncio",)
+
+from oc_images.util import (
+    Claim,
+    CommandError,
+    Priority,
+    RunPolicy,
+    Scheduler,
+    SingleFlight,
+    as_completed,
+    gather,
+    in_order,
+    merge,
+    run,
+)
+
+
+@pytest.fixture
+def policy():
+    policy = RunPolicy(timeout=5, retries=2)
+    policy.backoff_base = 0.001
+    with patch("oc_images.util.policy", policy):
+        yield policy
+
+
+@pytest.mark.asyncio
+async def test_scheduler_bounds_concurrency():
+    scheduler = Scheduler(jobs=3)
+    peak = 0
+
+    async def job():
+        nonlocal peak
+        async with scheduler.slot():
+            peak = max(peak, scheduler.running)
+            await asyncio.sleep(0.01)
+
+    await asyncio.gather(*[job() for _ in range(10)])
+    assert peak == 3
+    assert scheduler.running == 0
+
+
+@pytest.mark.asyncio
+async def test_scheduler_prefers_metadata():
+    scheduler = Scheduler(jobs=1)
+    order = []
+
+    async def job(name, priority):
+        async with scheduler.slot(priority):
+            order.append(name)
+            await asyncio.sleep(0)
+
+    await scheduler.acquire()
+    tasks = [
+        asyncio.create_task(job("inspect-1", Priority.INSPECT)),
+        asyncio.create_task(job("inspect-2", Priority.INSPECT)),
+        asyncio.create_task(job("metadata", Priority.METADATA)),
+    ]
+    await asyncio.sleep(0)
+    scheduler.release()
+    await asyncio.gather(*tasks)
+    assert order == ["metadata", "inspect-1", "inspect-2"]
+
+
+@pytest.mark.asyncio
+async def test_scheduler_cancelled_waiter():
+    scheduler = Scheduler(jobs=1)
+    await scheduler.acquire()
+    waiter = asyncio.create_task(scheduler.acquire())
+    await asyncio.sleep(0)
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+    scheduler.release()
+    assert scheduler.running == 0
+
+
+@pytest.mark.asyncio
+async def test_scheduler_promotes_claims():
+    scheduler = Scheduler(jobs=1)
+    order = []
+
+    async def job(name, priority, claim=None):
+        async with scheduler.slot(priority, claim):
+            order.append(name)
+            await asyncio.sleep(0)
+
+    claims = [Claim(), Claim()]
+    with patch("oc_images.util.scheduler", scheduler):
+        await scheduler.acquire()
+        tasks = [
+            asyncio.create_task(job("speculative-1", Priority.INSPECT, claims[0])),
+            asyncio.create_task(job("inspect", Priority.INSPECT)),
+            asyncio.create_task(job("speculative-2", Priority.INSPECT, claims[1])),
+        ]
+        await asyncio.sleep(0)
+        claims[1].promote(Priority.METADATA)
+        scheduler.release()
+        await asyncio.gather(*tasks)
+    assert order == ["speculative-2", "inspect", "speculative-1"]
+    assert scheduler.running == 0
+
+
+@pytest.mark.asyncio
+async def test_scheduler_caps_speculative_work():
+    scheduler = Scheduler(jobs=32, speculative=2)
+    peak = 0
+
+    async def job(priority):
+        nonlocal peak
+        async with scheduler.slot(priority):
+            peak = max(peak, scheduler.speculating)
+            await asyncio.sleep(0.01)
+
+    await asyncio.gather(*[job(Priority.SPECULATIVE) for _ in range(10)])
+    assert peak == 2
+    # Needed work still gets the slots speculative work may not have
+    await scheduler.acquire(Priority.SPECULATIVE)
+    await scheduler.acquire(Priority.SPECULATIVE)
+    await asyncio.wait_for(scheduler.acquire(Priority.INSPECT), 1)
+    assert (scheduler.running, scheduler.speculating) == (3, 2)
+
+
+async def delayed(value, delay):
+    await asyncio.sleep(delay)
+    return value
+
+
+@pytest.mark.asyncio
+async def test_as_completed():
+    tasks = [asyncio.create_task(delayed(v, d)) for v, d in [("a", 0.03), ("b", 0)]]
+    assert [r async for r in as_completed(tasks)] == ["b", "a"]
+
+
+@pytest.mark.asyncio
+async def test_in_order():
+    tasks = [asyncio.create_task(delayed(v, d)) for v, d in [("a", 0.03), ("b", 0)]]
+    assert [r async for r in in_order(tasks)] == ["a", "b"]
+
+
+@pytest.mark.asyncio
+async def test_merge():
+    async def generate(*items):
+        for value, delay in items:
+            await asyncio.sleep(delay)
+            yield value
+
+    merged = merge(generate(("a", 0.02), ("b", 0)), generate(("c", 0.01)))
+    assert [r async for r in merged] == ["c", "a", "b"]
+
+
+def flaky(tmp_path, failures: int, error: str):
+    """A command that fails `failures` times with `error`, then prints {}"""
+    counter = tmp_path / "attempts"
+    script = (
+        f"echo x >> {counter}; "
+        f'if [ $(wc -l < {counter}) -le {failures} ]; then echo "{error}" >&2; exit 1; fi; '
+        "echo '{}'"
+    )
+    return ["sh", "-c", script], counter
+
+
+@pytest.mark.asyncio
+async def test_run_retries_transient_errors(tmp_path, policy):
+    cmd, counter = flaky(tmp_path, 2, "error: 503 Service Unavailable")
+    assert await run(cmd) == {}
+    assert len(counter.read_text().splitlines()) == 3
+    assert policy.retried == 2
+
+
+@pytest.mark.asyncio
+async def test_run_does_not_retry_permanent_errors(tmp_path, policy):
+    cmd, counter = flaky(tmp_path, 1, "error: manifest unknown")
+    with pytest.raises(CommandError):
+        await run(cmd)
+    assert len(counter.read_text().splitlines()) == 1
+
+
+@pytest.mark.asyncio
+async def test_run_kills_on_timeout(policy):
+    policy.timeout = 0.1
+    policy.retries = 0
+    with pytest.raises(CommandError, match="timed out"):
+        await run(["sleep", "10"])
+    assert policy.timeouts == 1
+
+
+@pytest.mark.asyncio
+async def test_run_hedges_slow_inspections(tmp_path, policy):
+    policy.hedge = True
+    policy.latencies.extend([0.01] * RunPolicy.MIN_SAMPLES)
+    # The first attempt hangs, the hedged duplicate returns right away
+    marker = tmp_path / "started"
+    cmd = [
+        "sh",
+        "-c",
+        f"if [ -e {marker} ]; then echo '{{}}'; else touch {marker}; exec sleep 10; fi",
+    ]
+    assert await asyncio.wait_for(run(cmd), 5) == {}
+    assert policy.hedged == 1
+
+
+@pytest.mark.asyncio
+async def test_gather_cancels_on_failure():
+    cancelled = []
+
+    async def slow():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def fail():
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        await gather(slow(), slow(), fail())
+    assert cancelled == [True, True]
+
+
+@pytest.mark.asyncio
+async def test_single_flight_cancelled_with_last_caller():
+    flight = SingleFlight()
+    started = asyncio.Event()
+
+    async def call():
+        started.set()
+        await asyncio.sleep(10)
+
+    callers = [asyncio.create_task(flight.do("key", call)) for _ in range(2)]
+    await started.wait()
+    inner = flight._calls["key"]
+    callers[0].cancel()
+    await asyncio.sleep(0)
+    assert not inner.cancelled()
+    callers[1].cancel()
+    await asyncio.gather(*callers, return_exceptions=True)
+    await asyncio.sleep(0)
+    assert inner.cancelled()
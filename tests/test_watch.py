@@ -0,0 +1,81 @@
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+pytest_plugins = ("pytest_asyncio",)
+
+from oc_images.watch import Watcher
+
+REPO = "quay.io/openshift-release-dev/ocp-v4.0-art-dev"
+
+
+def imagestream(tags: dict):
+    return {
+        "metadata": {"namespace": "ocp", "name": "4.20-art-latest"},
+        "status": {
+            "tags": [
+                {
+                    "tag": tag,
+                    "items": [
+                        {
+                            "generation": generation,
+                            "dockerImageReference": f"{REPO}@sha256:{digest}",
+                        }
+                    ]
+                    if digest
+                    else [],
+                }
+                for tag, (generation, digest) in tags.items()
+            ]
+        },
+    }
+
+
+async def fake_image_info(cmd):
+    labels = {"version": "v4.20.0", "release": cmd[-1][-3:]}
+    return {"config": {"config": {"Labels": labels}}}
+
+
+@pytest.mark.asyncio
+async def test_watch_reports_changed_tags(image_cache):
+    watcher = Watcher("4.20-art-latest")
+    watcher.collection.is_info = AsyncMock(
+        side_effect=[
+            imagestream(
+                {"cli": (1, "aaa"), "installer": (1, "bbb"), "pod": (1, "ccc")}
+            ),
+            imagestream(
+                {"cli": (1, "aaa"), "installer": (2, "ddd"), "tools": (3, "eee")}
+            ),
+            imagestream(
+                {"cli": (4, "aaa"), "installer": (2, "ddd"), "tools": (3, "eee")}
+            ),
+            # A tag that failed to import
+            imagestream(
+                {
+                    "cli": (4, "aaa"),
+                    "installer": (2, "ddd"),
+                    "tools": (3, "eee"),
+                    "new": (5, None),
+                }
+            ),
+        ]
+    )
+    run = AsyncMock(side_effect=fake_image_info)
+    with patch("oc_images.image.run", run):
+        polls = [events async for events in watcher.watch(interval=0, count=4)]
+
+    assert polls[0] == []
+    assert [(kind, tag) for kind, tag, _ in polls[1]] == [
+        ("changed", "installer"),
+        ("removed", "pod"),
+        ("added", "tools"),
+    ]
+    assert [(kind, tag) for kind, tag, _ in polls[2]] == [("reimported", "cli")]
+    assert polls[3] == []
+    assert run.await_count == 2
+
+
+def test_watch_rejects_payload():
+    with pytest.raises(ValueError):
+        Watcher("quay.io/openshift-release-dev/ocp-release:4.18.3-x86_64")